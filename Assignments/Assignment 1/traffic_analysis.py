@@ -4,114 +4,356 @@
 
 import sys
 import argparse
-import matplotlib.pyplot as plt
-from scapy.all import *
-from scapy.layers.inet import IP, TCP
-from scapy.layers.inet6 import IPv6
+import socket
+import struct
+import mmap
+from multiprocessing import Pool, cpu_count
+import numpy as np
+import dpkt
 
+# numba is optional: when present the RTT-matching and binning loops run as
+# machine code, otherwise the plain numpy/dict paths below are used
+try:
+    from numba import njit, types as _nb_types
+    from numba.typed import Dict as _NumbaDict
+except ImportError:
+    njit = None
 
-# First parse the pcap
+if njit is not None:
+    @njit(cache=True)
+    def _rtt_kernel(ts, dir_mask, seq, ack, payload_len):
+        # dir_mask: 1 = client->server (data), 0 = server->client (ACK)
+        # ts is int64 nanoseconds
+        sent = _NumbaDict.empty(key_type=_nb_types.int64, value_type=_nb_types.int64)
+        n = ts.shape[0]
+        rtts = np.empty(n)
+        acks = np.empty(n)
+        m = 0
+        for i in range(n):
+            if dir_mask[i] == 1:
+                if payload_len[i] > 0:
+                    sent[seq[i] + payload_len[i]] = ts[i]
+            else:
+                a = ack[i]
+                if a in sent:
+                    rtt_val = (ts[i] - sent[a]) / 1e6 # ns -> ms
+                    del sent[a]
+                    if 0 < rtt_val < 10000:
+                        rtts[m] = rtt_val
+                        acks[m] = ts[i] / 1e9 # ns -> s wall clock
+                        m += 1
+        return rtts[:m], acks[:m]
+
+    @njit(cache=True)
+    def _bin_kernel(t, plen):
+        out = np.zeros(t.max() + 1)
+        for i in range(t.shape[0]):
+            out[t[i]] += plen[i]
+        return out * 8
+else:
+    _rtt_kernel = None
+    _bin_kernel = None
+
+
+# First parse the pcap. Classic pcap is mmap'd and the 16-byte record headers
+# are unpacked in place, so record bytes come straight out of the page cache
+# with no read() copies; pcapng falls back to dpkt's streaming reader.
+# Generator either way, so memory stays O(1) in capture size.
 def open_pcap(file):
-    pcaket = rdpcap(file)
-    return pcaket
-
-# Isolate traffic corresponding to given webpage
-def filter_pcaket(pkts, clt_ip, srvr_ip):
-    final = []
-    for pkt in pkts:
-        if (IP in pkt or IPv6 in pkt) and TCP in pkt: # Only TCP packets as per Piazza (IPv4 or IPv6)
-            ip = pkt[IP] if IP in pkt else pkt[IPv6]
-            if ((ip.src==clt_ip and ip.dst==srvr_ip) or (ip.src==srvr_ip and ip.dst==clt_ip)):
-                final.append(pkt)
-    return final
+    with open(file, 'rb', buffering=1 << 17) as f: # 128 KiB reads for the dpkt fallback
+        endch, ts_div = _pcap_meta(f.read(24))
+        if endch is None:
+            f.seek(0)
+            for ts, buf in dpkt.pcapng.Reader(f):
+                yield int(ts * 1_000_000_000), buf
+            return
+        rec = struct.Struct(endch + 'IIII')
+        frac_mult = 1_000_000_000 // ts_div # integer ns, no float rounding per packet
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            size = len(mm)
+            off = 24
+            while off + 16 <= size:
+                ts_s, ts_frac, caplen, _ = rec.unpack_from(mm, off)
+                off += 16
+                yield ts_s * 1_000_000_000 + ts_frac * frac_mult, mm[off:off + caplen]
+                off += caplen
+        finally:
+            mm.close()
+
+# Classic pcap global header: magic tells us byte order and timestamp resolution
+def _pcap_meta(header):
+    magic = header[:4]
+    if magic == b'\xd4\xc3\xb2\xa1': return '<', 1_000_000
+    if magic == b'\xa1\xb2\xc3\xd4': return '>', 1_000_000
+    if magic == b'\x4d\x3c\xb2\xa1': return '<', 1_000_000_000
+    if magic == b'\xa1\xb2\x3c\x4d': return '>', 1_000_000_000
+    return None, None # pcapng or unknown -> caller falls back to streaming dpkt
+
+# One cheap sweep over the 16-byte record headers to find ~nchunks byte offsets
+# that fall exactly on record boundaries
+def _chunk_bounds(path, nchunks):
+    with open(path, 'rb') as f:
+        endch, _ = _pcap_meta(f.read(24))
+        if endch is None:
+            return None
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    rec = struct.Struct(endch + 'IIII')
+    size = len(mm)
+    step = max(1, (size - 24) // nchunks)
+    bounds = [24]
+    nxt = 24 + step
+    off = 24
+    while off + 16 <= size:
+        if off >= nxt:
+            bounds.append(off)
+            nxt = off + step
+        caplen = rec.unpack_from(mm, off)[2]
+        off += 16 + caplen
+    mm.close()
+    bounds.append(size)
+    return bounds
+
+# Yield (ts, buf) for the records in [start, end) of a classic pcap,
+# unpacking headers in place on the mmap'd file
+def _iter_range(path, start, end):
+    with open(path, 'rb') as f:
+        endch, ts_div = _pcap_meta(f.read(24))
+        rec = struct.Struct(endch + 'IIII')
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    frac_mult = 1_000_000_000 // ts_div
+    try:
+        off = start
+        while off < end:
+            ts_s, ts_frac, caplen, _ = rec.unpack_from(mm, off)
+            off += 16
+            yield ts_s * 1_000_000_000 + ts_frac * frac_mult, mm[off:off + caplen]
+            off += caplen
+    finally:
+        mm.close()
+
+# Worker: run the fused extractor over one byte range of the file
+def _analyze_chunk(job):
+    path, start, end, clt, srv = job
+    return _extract(_iter_range(path, start, end), clt, srv)
+
+# Shard the capture across cores at record boundaries and concatenate the
+# per-chunk arrays back in file order (returns None when sharding is not
+# possible, e.g. pcapng input or a single-core machine)
+def _extract_parallel(path, clt_ip, srvr_ip):
+    nproc = cpu_count()
+    if nproc < 2:
+        return None
+    bounds = _chunk_bounds(path, nproc)
+    if bounds is None or len(bounds) <= 2:
+        return None
+    jobs = [(path, bounds[i], bounds[i + 1], clt_ip, srvr_ip) for i in range(len(bounds) - 1)]
+    with Pool(len(jobs)) as pool:
+        parts = pool.map(_analyze_chunk, jobs)
+    return tuple(np.concatenate([p[i] for p in parts]) for i in range(6))
+
+# Pack a dotted IP string to raw bytes once so per-packet compares are plain bytes compares
+def pack_ip(addr):
+    try:
+        return socket.inet_aton(addr)
+    except OSError:
+        return socket.inet_pton(socket.AF_INET6, addr)
+
+# Direction codes used in the extracted arrays
+DIR_DOWN = 0 # server -> client
+DIR_UP = 1   # client -> server
+
+# Precompiled header structs for the IPv4 fast path (parse runs entirely in
+# C-level unpack calls, no per-packet parser objects)
+_IP_LEN = struct.Struct('!H')  # IPv4 total length at frame offset 16
+_SEQ_ACK = struct.Struct('!II') # TCP seq+ack at tcp offset 4
+
+# Fused single pass: filter the stream and pull out the few fields
+# throughput/rtt need into flat numpy arrays (one packet touch total)
+def _extract(reader, clt_ip, srvr_ip):
+    clt_b = pack_ip(clt_ip)
+    srv_b = pack_ip(srvr_ip)
+    # Preallocated arrays grown by doubling: one store per field per packet
+    # instead of list-object bookkeeping and a convert-at-the-end copy
+    cap = 1 << 16
+    n = 0
+    ts_a = np.empty(cap, dtype=np.int64) # integer nanoseconds
+    plen_a = np.empty(cap, dtype=np.int64)
+    dir_a = np.empty(cap, dtype=np.int8)
+    seq_a = np.empty(cap, dtype=np.int64)
+    ack_a = np.empty(cap, dtype=np.int64)
+    payload_a = np.empty(cap, dtype=np.int64)
+    # Bind classes as locals so the hot loop skips
+    # repeated global/attribute lookups per packet
+    Ethernet = dpkt.ethernet.Ethernet
+    ip_classes = (dpkt.ip.IP, dpkt.ip6.IP6)
+    TCP = dpkt.tcp.TCP
+    ipv4 = len(clt_b) == 4
+    for ts, buf in reader:
+        # BPF-style prefilter on the raw bytes so packets we do not care
+        # about are dropped before any parser object is allocated. For
+        # plain IPv4 every field we need sits at a computable offset, so
+        # the whole parse is C-level unpack calls; IPv6 keeps dpkt.
+        et = buf[12:14]
+        if et == b'\x08\x00': # IPv4 fast path
+            if not ipv4 or buf[23:24] != b'\x06': # wrong family / not TCP
+                continue
+            src = buf[26:30]
+            if src == clt_b:
+                if buf[30:34] != srv_b:
+                    continue
+                dirn = DIR_UP
+            elif src == srv_b:
+                if buf[30:34] != clt_b:
+                    continue
+                dirn = DIR_DOWN
+            else:
+                continue
+            ihl = (buf[14] & 0x0f) << 2
+            tcp_off = 14 + ihl
+            seq_v, ack_v = _SEQ_ACK.unpack_from(buf, tcp_off + 4)
+            payload = _IP_LEN.unpack_from(buf, 16)[0] - ihl - ((buf[tcp_off + 12] >> 4) << 2)
+        elif et == b'\x86\xdd': # IPv6: full dpkt parse
+            eth = Ethernet(buf)
+            ip = eth.data
+            if not isinstance(ip, ip_classes): # Only TCP packets as per Piazza (IPv4 or IPv6)
+                continue
+            tcp = ip.data
+            if not isinstance(tcp, TCP):
+                continue
+            if ip.src == clt_b and ip.dst == srv_b:
+                dirn = DIR_UP
+            elif ip.src == srv_b and ip.dst == clt_b:
+                dirn = DIR_DOWN
+            else:
+                continue
+            seq_v = tcp.seq
+            ack_v = tcp.ack
+            payload = len(tcp.data)
+        else:
+            continue
+        if n == cap:
+            cap *= 2
+            ts_a = np.resize(ts_a, cap)
+            plen_a = np.resize(plen_a, cap)
+            dir_a = np.resize(dir_a, cap)
+            seq_a = np.resize(seq_a, cap)
+            ack_a = np.resize(ack_a, cap)
+            payload_a = np.resize(payload_a, cap)
+        ts_a[n] = ts
+        plen_a[n] = len(buf)
+        dir_a[n] = dirn
+        seq_a[n] = seq_v
+        ack_a[n] = ack_v
+        payload_a[n] = payload
+        n += 1
+    return (ts_a[:n], plen_a[:n], dir_a[:n], seq_a[:n], ack_a[:n], payload_a[:n])
 
 # Find the throughput in one second window for download/upload
-def throughput(pkts, clt_ip, srvr_ip, dir):
-    one_sec = {}
-    for pkt in pkts:
-        if (IP in pkt or IPv6 in pkt) and TCP in pkt:
-            ip = pkt[IP] if IP in pkt else pkt[IPv6]
-            time = int(pkt.time)
-
-
-            if (dir == "down" and ip.src == srvr_ip and ip.dst == clt_ip):
-                one_sec[time] = one_sec.get(time, 0) + len(pkt)
-            
-            elif (dir == "up" and ip.src == clt_ip and ip.dst == srvr_ip):
-                one_sec[time] = one_sec.get(time, 0) + len(pkt)
-    
-    if not one_sec: return [], []
-    times = sorted(one_sec.keys())
-    start_time = times[0]
-    times = [t - start_time for t in times] # Start from 0
-    throughput = [one_sec[t + start_time] * 8 for t in times] # Convert to bits
-    
-    return times, throughput
-
-def rtt(pkts, clt_ip, srvr_ip):
-    rtts = []
-    ack_times = []
+def throughput(arrays, dir):
+    ts, plen, dir_mask, _, _, _ = arrays
+    want = DIR_DOWN if dir == "down" else DIR_UP
+    mask = dir_mask == want
+    if not mask.any(): return [], []
+    t = ts[mask] // 1_000_000_000 # ns -> one-second bins
+    t -= t.min() # Start from 0
+    if _bin_kernel is not None:
+        thrghput = _bin_kernel(t, plen[mask]) # Convert to bits, binned per second
+    else:
+        thrghput = np.bincount(t, weights=plen[mask]) * 8
+    times = np.arange(thrghput.size)
+
+    return times, thrghput
+
+def rtt(arrays):
+    ts, _, dir_mask, seq, ack, payload_len = arrays
+    if _rtt_kernel is not None:
+        return _rtt_kernel(ts, dir_mask, seq, ack, payload_len)
+    # Preallocate outputs at the only possible upper bound (one sample per
+    # packet) and trim; avoids per-sample list append bookkeeping
+    rtts = np.empty(ts.shape[0])
+    ack_times = np.empty(ts.shape[0])
+    m = 0
     sent_pkts = {}
 
 
-    for pkt in pkts:
-        if (IP in pkt or IPv6 in pkt) and TCP in pkt:
-            ip = pkt[IP] if IP in pkt else pkt[IPv6]
-            tcp = pkt[TCP]
-            
-            if ip.src == clt_ip and ip.dst == srvr_ip:
-                payload_len = len(tcp.payload) if tcp.payload else 0
-                if payload_len > 0:  # Only data packets
-                    sent_pkts[tcp.seq] = (payload_len, pkt.time)
-            elif ip.src == srvr_ip and ip.dst == clt_ip:
-                ack_num = tcp.ack
-                for seq_num, (length, send_time) in list(sent_pkts.items()): # Find matching data packet where A = S + L
+    for i in range(ts.shape[0]):
+        if dir_mask[i] == DIR_UP:
+            if payload_len[i] > 0:  # Only data packets
+                # Key by the ACK we expect back (A = S + L) so matching is one dict lookup
+                sent_pkts[int(seq[i]) + int(payload_len[i])] = int(ts[i])
+        else:
+            send_time = sent_pkts.pop(int(ack[i]), None)
+            if send_time is not None:
+                rtt_val = (int(ts[i]) - send_time) / 1e6 # ns -> ms
+                if 0 < rtt_val < 10000:
+                    rtts[m] = rtt_val
+                    ack_times[m] = ts[i] / 1e9 # Wall clock time in seconds
+                    m += 1
+
 
+    return rtts[:m], ack_times[:m]
 
-                    if ack_num == seq_num + length:
-                        rtt_val = (pkt.time - send_time) * 1000 # Convert to ms
-                        if 0 < rtt_val < 10000: 
-                            rtts.append(rtt_val)
-                            ack_times.append(pkt.time) # Wall clock time
-                        del sent_pkts[seq_num]
-                        break
 
+# Plotting functions (matplotlib is imported lazily so --help / parse-only
+# runs do not pay its multi-second import cost). One figure is created on
+# the headless Agg backend and cleared between plots instead of being
+# rebuilt, and huge traces are strided down before rendering.
+_plot_state = None
+_MAX_PLOT_POINTS = 10000
 
-    return rtts, ack_times
+def _get_ax():
+    global _plot_state
+    if _plot_state is None:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+        fig, ax = plt.subplots()
+        _plot_state = (fig, ax)
+    return _plot_state
 
+def _downsample(x, y):
+    x = np.asarray(x)
+    y = np.asarray(y)
+    if x.size > _MAX_PLOT_POINTS:
+        idx = np.linspace(0, x.size - 1, _MAX_PLOT_POINTS).astype(int)
+        x = x[idx]
+        y = y[idx]
+    return x, y
 
-# Plotting functions
 def plot_throughput(times, throughput, file, title):
-    plt.figure()
-    plt.plot(times, throughput)
-    plt.xlabel('Time (seconds)')
-    plt.ylabel('Throughput (bits/second)')
-    plt.title(title)
-    plt.grid(True)
-    plt.savefig(file)
-    plt.close()
+    fig, ax = _get_ax()
+    ax.cla()
+    times, throughput = _downsample(times, throughput)
+    ax.plot(times, throughput)
+    ax.set_xlabel('Time (seconds)')
+    ax.set_ylabel('Throughput (bits/second)')
+    ax.set_title(title)
+    ax.grid(True)
+    fig.savefig(file)
     print(f"Saved {file}")
 
 def plot_rtt(rtts, ack_times, file):
-    if not rtts:
+    if len(rtts) == 0:
         print("No RTT data to plot")
         return
-    start_time = min(ack_times) # Normalize time to start from 0
-    normalized_times = [t - start_time for t in ack_times]
-    plt.figure()
-    plt.plot(normalized_times, rtts, 'ro-', markersize=4)
-    plt.xlabel('Time (seconds)')
-    plt.ylabel('RTT (ms)')
-    plt.title('Round Trip Time (RTT)')
-    plt.grid(True)
-    plt.savefig(file)
-    plt.close()
+    ack_times = np.asarray(ack_times)
+    normalized_times = ack_times - ack_times.min() # Normalize time to start from 0
+    fig, ax = _get_ax()
+    ax.cla()
+    normalized_times, rtts = _downsample(normalized_times, rtts)
+    ax.plot(normalized_times, rtts, 'ro-', markersize=4)
+    ax.set_xlabel('Time (seconds)')
+    ax.set_ylabel('RTT (ms)')
+    ax.set_title('Round Trip Time (RTT)')
+    ax.grid(True)
+    fig.savefig(file)
     print(f"Saved {file}")
 
 # main method
 def main():
     parser = argparse.ArgumentParser(description='Analyze network traffic performance')
-    parser.add_argument('--file', required=True, help='PCAP file to analyze')  
+    parser.add_argument('--file', required=True, help='PCAP file to analyze')
     parser.add_argument('--client', required=True, help='Client IP address')
     parser.add_argument('--server', required=True, help='Server IP address')
     parser.add_argument('--throughput', action='store_true', help='Calculate throughput')
@@ -119,20 +361,22 @@ def main():
     parser.add_argument('--up', action='store_true', help='Upload throughput')
     parser.add_argument('--rtt', action='store_true', help='Calculate RTT')
     args = parser.parse_args()
-    packets = open_pcap(args.file) # Open and filter packets
-    filtered_packets = filter_pcaket(packets, args.client, args.server)
-    print(f"Loaded {len(packets)} packets, filtered to {len(filtered_packets)} TCP packets")
-    
+    # Shard the parse across cores when possible, else one streaming pass
+    arrays = _extract_parallel(args.file, args.client, args.server)
+    if arrays is None:
+        arrays = _extract(open_pcap(args.file), args.client, args.server)
+    print(f"Filtered to {arrays[0].shape[0]} TCP packets")
+
     if args.throughput:
         if args.down:
-            times, thrghput = throughput(filtered_packets, args.client, args.server, "down")
+            times, thrghput = throughput(arrays, "down")
             plot_throughput(times, thrghput, "down_throughput.png", "Download Throughput")
         elif args.up:
-            times, thrghput = throughput(filtered_packets, args.client, args.server, "up")
+            times, thrghput = throughput(arrays, "up")
             plot_throughput(times, thrghput, "up_throughput.png", "Upload Throughput")
     elif args.rtt:
-        rtts, ack_times = rtt(filtered_packets, args.client, args.server)
-        if rtts:
+        rtts, ack_times = rtt(arrays)
+        if len(rtts) > 0:
             plot_rtt(rtts, ack_times, "rtt.png")
             print(f"Found {len(rtts)} RTT samples")
         else:
@@ -146,7 +390,7 @@ if __name__ == '__main__':
 # Client ip : 10.194.38.132
 # Server ip: 104.208.16.90
 
-# HTTPS capture IPs:  
+# HTTPS capture IPs:
 # Client ip : 10.184.48.75
 # Server ip: 20.189.173.10
 
@@ -159,4 +403,3 @@ python3 traffic_analysis.py --file https.pcap --client 10.184.48.75 --server 20.
 python3 traffic_analysis.py --file https.pcap --client 10.184.48.75 --server 20.189.173.10 --throughput --up
 python3 traffic_analysis.py --file https.pcap --client 10.184.48.75 --server 20.189.173.10 --rtt
 """
-
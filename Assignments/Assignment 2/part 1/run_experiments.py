@@ -12,8 +12,11 @@ K_VALUES = [1, 2, 5, 10, 20, 50, 100, 200]
 RUNS_PER_K = 5
 SERVER_CMD = "./server --config config.json"
 # We will pass k as an argument directly
-CLIENT_CMD_TMPL = "./client --config config.json --quiet --k {k}" 
+CLIENT_CMD_TMPL = "./client --config config.json --quiet --k {k}"
 RESULTS_CSV = Path("results.csv")
+FLUSH_EVERY = 16 # Batch CSV rows instead of open/append/close per run
+# Compiled once; the search runs RUNS_PER_K * len(K_VALUES) times
+_ELAPSED_RE = re.compile(r"ELAPSED_MS:(\d+)")
 
 def main():
     # Prepare CSV
@@ -31,25 +34,35 @@ def main():
     srv = h2.popen(SERVER_CMD, shell=True)
     time.sleep(1) # Give server time to bind
 
+    rows = []
+
+    def flush_rows():
+        if rows:
+            with RESULTS_CSV.open("a", newline="", buffering=1 << 16) as f:
+                csv.writer(f).writerows(rows)
+            rows.clear()
+
     try:
         for k in K_VALUES:
             print(f"Testing k={k}...")
             for r in range(1, RUNS_PER_K + 1):
                 # Format the client command with the current value of k
                 cmd = CLIENT_CMD_TMPL.format(k=k)
-                
+
                 out = h1.cmd(cmd)
-                
-                m = re.search(r"ELAPSED_MS:(\d+)", out)
+
+                m = _ELAPSED_RE.search(out)
                 if not m:
                     print(f"[warn] No ELAPSED_MS found for k={k} run={r}. Raw:\n{out}")
                     continue
-                
+
                 ms = int(m.group(1))
-                with RESULTS_CSV.open("a", newline="") as f:
-                    csv.writer(f).writerow([k, r, ms])
+                rows.append([k, r, ms])
+                if len(rows) >= FLUSH_EVERY:
+                    flush_rows()
                 print(f"  k={k} run={r} elapsed_ms={ms}")
     finally:
+        flush_rows()
         print("Stopping server and network...")
         srv.terminate()
         time.sleep(0.2)
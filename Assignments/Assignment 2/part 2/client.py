@@ -5,6 +5,7 @@ import socket
 import json
 import time
 import argparse
+from collections import Counter
 
 # Connect to the server and download the word file
 def download_file(config, client_id, quiet):
@@ -18,16 +19,23 @@ def download_file(config, client_id, quiet):
     try:
         client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         client_socket.connect((server_ip, port))
-        
+        # Buffered reader: responses are newline-delimited, so readline()
+        # coalesces kernel reads into big chunks and never splits a response
+        # across partial recv()s
+        rf = client_socket.makefile('rb', buffering=65536)
+
         all_words = []
         offset = p
-        
+
         while True:
             request = f"{offset},{k}\n"
             client_socket.send(request.encode())
-            
-            response = client_socket.recv(4096).decode().strip()
-            
+
+            line = rf.readline()
+            if not line:
+                break
+            response = line.decode().strip()
+
             if not response:
                 break
             
@@ -48,6 +56,10 @@ def download_file(config, client_id, quiet):
             print(f"[{client_id}] Error: {e}")
         return None
     finally:
+        try:
+            rf.close()
+        except NameError:
+            pass
         client_socket.close()
 
     end_time = time.time()
@@ -56,11 +68,9 @@ def download_file(config, client_id, quiet):
     if not quiet:
         print(f"[{client_id}] Download complete in {completion_time:.3f} seconds.")
         
-        # Manual word frequency count using a dictionary
-        word_counts = {}
-        for word in all_words:
-            word_counts[word] = word_counts.get(word, 0) + 1
-            
+        # Word frequency count in one C-level pass
+        word_counts = Counter(all_words)
+
         # Print sorted results
         for word, count in sorted(word_counts.items()):
             print(f"{word}, {count}")
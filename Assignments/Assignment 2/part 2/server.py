@@ -4,37 +4,39 @@
 import socket
 import json
 import select
+from collections import deque
 
-# """Load from word.txt file into a list
+# """Load from word.txt file into a list (pre-encoded so replies need no
+# per-request UTF-8 encode pass)
 def load_words(filename):
     with open(filename, 'r') as f:
         content = f.read().strip()
-    return content.split(',')
+    return [w.encode() for w in content.split(',')]
 
 # Parse a 'p,k' request and sends back the corresponding words
 def process_request(client_socket, request, words):
     try:
         parts = request.split(',')
         if len(parts) != 2:
-            response = "Error: Invalid request format\n"
+            response = b"Error: Invalid request format\n"
         else:
             p = int(parts[0])
             k = int(parts[1])
-            
+
             if p >= len(words):
-                response = "EOF\n"
+                response = b"EOF\n"
             else:
                 end_idx = p + k
                 requested_words = words[p:end_idx]
-                
+
                 if end_idx >= len(words):
-                    requested_words.append("EOF")
-                
-                response = ",".join(requested_words) + "\n"
-        
-        client_socket.send(response.encode())
+                    requested_words.append(b"EOF")
+
+                response = b",".join(requested_words) + b"\n"
+
+        client_socket.sendall(response)
     except (ValueError, IndexError) as e:
-        client_socket.send(f"Error: {e}\n".encode())
+        client_socket.sendall(f"Error: {e}\n".encode())
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
 
@@ -51,7 +53,8 @@ def run_server(config):
     print(f"Server listening on {config['server_ip']}:{config['port']}")
     
     client_sockets = [server_socket]
-    request_queue = []
+    request_queue = deque()
+    max_per_loop = 32 # Drain the queue per select() pass, capped for fairness
 
     try:
         while True:
@@ -80,13 +83,14 @@ def run_server(config):
                         if sock in client_sockets:
                             client_sockets.remove(sock)
 
-            # Process all requests in the queue (FCFS)
+            # Process queued requests (FCFS): drain up to max_per_loop per
+            # iteration instead of paying one select() round-trip per request
             processed_in_loop = 0
-            while request_queue and processed_in_loop == 0:
-                client_sock, req = request_queue.pop(0)
+            while request_queue and processed_in_loop < max_per_loop:
+                client_sock, req = request_queue.popleft()
                 if client_sock.fileno() != -1: # Check if socket is still valid
                     process_request(client_sock, req, words)
-                    processed_in_loop = 1 # We process one request at a time
+                    processed_in_loop += 1
 
     except KeyboardInterrupt:
         print("\nServer shutting down.")
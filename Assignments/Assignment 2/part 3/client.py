@@ -8,7 +8,7 @@ import sys
 import traceback
 
 class WordCountingClient:
-    def __init__(self, config_file='config.json', batch_size=1, client_id='client'):
+    def __init__(self, config_file='config.json', batch_size=1, client_id='client', log_dir='logs'):
         try:
             with open(config_file, 'r') as f:
                 self.config = json.load(f)
@@ -23,8 +23,9 @@ class WordCountingClient:
         
         self.batch_size = batch_size
         self.client_id = client_id
-        
-        os.makedirs('logs', exist_ok=True)
+        self.log_dir = log_dir
+
+        os.makedirs(log_dir, exist_ok=True)
         self.word_counts = {}
         
         print(f"Client {self.client_id} initialized: batch_size={self.batch_size}, server={self.server_ip}:{self.port}")
@@ -125,9 +126,13 @@ class WordCountingClient:
         end_time = time.time()
         total_time = (end_time - start_time) * 1000
 
-        completion_file = f'logs/{self.client_id}_completion.txt'
-        with open(completion_file, 'w') as f:
+        # Write-then-rename: os.replace is atomic on POSIX, so the runner
+        # can never observe a half-written completion file
+        completion_file = f'{self.log_dir}/{self.client_id}_completion.txt'
+        tmp_file = f'{self.log_dir}/.{self.client_id}_completion.txt.tmp'
+        with open(tmp_file, 'w') as f:
             f.write(f"{total_time:.2f}\n")
+        os.replace(tmp_file, completion_file)
         
         return total_time
 
@@ -135,9 +140,10 @@ def main():
     parser = argparse.ArgumentParser(description='Word Counting Client')
     parser.add_argument('--batch-size', type=int, default=1, help='Number of requests to send back-to-back (c value)')
     parser.add_argument('--client-id', type=str, default='client', help='Unique client identifier')
+    parser.add_argument('--log-dir', type=str, default='logs', help='Directory for completion files')
     args = parser.parse_args()
 
-    client = WordCountingClient(batch_size=args.batch_size, client_id=args.client_id)
+    client = WordCountingClient(batch_size=args.batch_size, client_id=args.client_id, log_dir=args.log_dir)
     completion_time = client.download_file()
 
     if completion_time:
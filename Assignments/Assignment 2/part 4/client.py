@@ -125,9 +125,12 @@ class WordCountingClient:
         end_time = time.time()
         total_time = (end_time - start_time) * 1000
 
+        # Atomic write-then-rename so the runner never reads a partial file
         completion_file = f'logs/{self.client_id}_completion.txt'
-        with open(completion_file, 'w') as f:
+        tmp_file = f'logs/.{self.client_id}_completion.txt.tmp'
+        with open(tmp_file, 'w') as f:
             f.write(f"{total_time:.2f}\n")
+        os.replace(tmp_file, completion_file)
         
         return total_time
 
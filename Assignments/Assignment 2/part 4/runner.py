@@ -6,6 +6,7 @@ import glob
 import numpy as np
 import matplotlib.pyplot as plt
 import sys
+from topology import create_network
 
 class Runner:
     def __init__(self, config_file='config.json'):
@@ -23,29 +24,57 @@ class Runner:
 
     def parse_logs(self):
         print("Parsing completion logs...")
-        times, rogue_times, normal_times = [], [], []
-        for f in glob.glob("logs/*_completion.txt"):
-            with open(f, 'r') as file:
-                t = float(file.read().strip())
-                times.append(t)
-                if 'rogue' in f: rogue_times.append(t)
-                else: normal_times.append(t)
-        
-        print(f"Parsed {len(times)} logs. Rogue: {np.mean(rogue_times):.2f}ms, Normal Avg: {np.mean(normal_times):.2f}ms")
+        # scandir + raw fd read: one syscall per tiny file, no glob/fnmatch
+        with os.scandir('logs') as it:
+            entries = [e for e in it if e.name.endswith('_completion.txt')]
+        # Unboxed float64 accumulators instead of lists of boxed floats
+        times = np.empty(len(entries))
+        is_rogue = np.zeros(len(entries), dtype=bool)
+        n = 0
+        bad = 0
+        for e in entries:
+            try:
+                # Files are renamed into place atomically; empty means broken
+                if e.stat().st_size == 0:
+                    bad += 1
+                    continue
+                fd = os.open(e.path, os.O_RDONLY)
+                try:
+                    buf = os.read(fd, 64)
+                finally:
+                    os.close(fd)
+                if not buf.strip():
+                    bad += 1
+                    continue
+                times[n] = float(buf)
+                is_rogue[n] = 'rogue' in e.name
+                n += 1
+            except (ValueError, OSError):
+                bad += 1
+        if bad:
+            print(f"Skipped {bad} unreadable completion files")
+        times = times[:n]
+        is_rogue = is_rogue[:n]
+        rogue_times = times[is_rogue]
+        normal_times = times[~is_rogue]
+
+        if len(rogue_times) and len(normal_times):
+            print(f"Parsed {len(times)} logs. Rogue: {np.mean(rogue_times):.2f}ms, Normal Avg: {np.mean(normal_times):.2f}ms")
         return times
 
     def calculate_jfi(self, times):
-        if not times or len(times) < self.num_clients: return 0.0
-        utilities = [1000.0 / t for t in times if t > 0]
-        if not utilities or len(utilities) != self.num_clients: return 0.0
-        n, sum_u, sum_u_sq = len(utilities), sum(utilities), sum(u**2 for u in utilities)
-        return (sum_u**2) / (n * sum_u_sq) if (n * sum_u_sq) > 0 else 0.0
+        if len(times) < self.num_clients: return 0.0
+        a = np.asarray(times, dtype=np.float64)
+        a = a[a > 0]
+        if len(a) != self.num_clients: return 0.0
+        u = 1000.0 / a # Utilities in one vectorized pass
+        sum_u_sq = np.dot(u, u)
+        return float(u.sum()**2 / (len(a) * sum_u_sq)) if sum_u_sq > 0 else 0.0
 
     def run_experiment(self, c_value):
         print(f"\n{'='*50}\n=== Running experiment with c = {c_value} (Round-Robin) ===\n{'='*50}")
         self.cleanup_logs()
-        
-        from topology import create_network
+
         net = create_network(num_clients=self.num_clients)
         
         try:
@@ -61,14 +90,20 @@ class Runner:
             procs.extend([c.popen(["python3", "client.py", "--batch-size", "1", "--client-id", f"normal_{i+1}"]) for i, c in enumerate(clients[1:])])
             print("All clients started, waiting for completion...")
             
-            exit_codes = [p.wait() for p in procs]
+            # Reap clients in completion order rather than list order
+            pending = {p.pid: i for i, p in enumerate(procs)}
+            exit_codes = [None] * len(procs)
+            while pending:
+                pid, status = os.waitpid(-1, 0)
+                if pid in pending:
+                    exit_codes[pending.pop(pid)] = os.waitstatus_to_exitcode(status)
             print(f"Client exit codes: {exit_codes}")
             
             print("Stopping server...")
             server_proc.terminate()
             server_proc.wait()
-            time.sleep(1)
 
+            # Completion files land via atomic rename; safe to parse now
             all_times = self.parse_logs()
             if len(all_times) == self.num_clients:
                 jfi = self.calculate_jfi(all_times)
@@ -93,24 +128,26 @@ class Runner:
         else: print("\nNo experiments completed successfully.")
 
     def plot_jfi_vs_c(self, results):
-        c_values = [r['c'] for r in results]
-        jfi_values = [r['jfi'] for r in results]
-        
-        plt.figure(figsize=(12, 7))
-        plt.plot(c_values, jfi_values, 'o-', color='#2ca02c', linewidth=2, markersize=8, label='Round-Robin Fairness')
-        plt.xlabel('Greediness Factor (c)', fontsize=14)
-        plt.ylabel("Jain's Fairness Index (JFI)", fontsize=14)
-        plt.title("Fairness with Round-Robin Scheduling", fontsize=16)
-        plt.grid(True, linestyle='--', alpha=0.6)
-        plt.xticks(np.arange(min(c_values), max(c_values) + 1, 1))
-        plt.ylim(0.95, 1.005) # Zoom in on the high fairness values
-        
-        for c, jfi in zip(c_values, jfi_values):
-            plt.text(c, jfi + 0.001, f'{jfi:.4f}', ha='center', fontsize=9)
-            
-        plt.legend()
-        plt.tight_layout()
-        plt.savefig('p4_plot.png')
+        c_values = np.asarray([r['c'] for r in results])
+        jfi_values = np.asarray([r['jfi'] for r in results])
+
+        # Suspend interactive draws so the labels cost one layout pass at
+        # savefig instead of one per point; tight bbox replaces tight_layout
+        with plt.ioff():
+            plt.figure(figsize=(12, 7))
+            plt.plot(c_values, jfi_values, 'o-', color='#2ca02c', linewidth=2, markersize=8, label='Round-Robin Fairness')
+            plt.xlabel('Greediness Factor (c)', fontsize=14)
+            plt.ylabel("Jain's Fairness Index (JFI)", fontsize=14)
+            plt.title("Fairness with Round-Robin Scheduling", fontsize=16)
+            plt.grid(True, linestyle='--', alpha=0.6)
+            plt.xticks(np.arange(c_values.min(), c_values.max() + 1, 1))
+            plt.ylim(0.95, 1.005) # Zoom in on the high fairness values
+
+            for c, jfi in zip(c_values, jfi_values):
+                plt.text(c, jfi + 0.001, f'{jfi:.4f}', ha='center', fontsize=9)
+
+            plt.legend()
+            plt.savefig('p4_plot.png', bbox_inches='tight')
         print("\nPlot successfully saved as p4_plot.png")
 
 if __name__ == '__main__':
@@ -1,14 +1,19 @@
 #!/usr/bin/env python3
 import socket
+import selectors
 import threading
+import functools
 import json
 import time
 import os
-import queue
 import logging
 import sys
 import random
-from collections import deque
+from array import array
+from collections import deque, namedtuple
+
+# Compact request record; cheaper than a dict per request
+Req = namedtuple('Req', 'sock p k cid')
 
 class RoundRobinServer:
     def __init__(self, config_file='config.json'):
@@ -23,6 +28,7 @@ class RoundRobinServer:
         self.client_queues = {}
         self.client_order = deque()
         self.lock = threading.Lock()
+        self.cv = threading.Condition(self.lock) # Signalled on every enqueue
         self.running = False
         
         os.makedirs('logs', exist_ok=True)
@@ -35,72 +41,149 @@ class RoundRobinServer:
 
     def load_words(self):
         with open('words.txt', 'r') as f:
-            return f.read().strip().split(',')
+            words = f.read().strip().split(',')
+        # Precompute the comma-joined bytes blob + offsets so replies are a
+        # single slice, no join/encode in the hot path
+        self.words_bytes = (','.join(words) + ',').encode('utf-8')
+        offsets = array('i', [0])
+        acc = 0
+        for w in words:
+            acc += len(w) + 1
+            offsets.append(acc)
+        self.offsets = offsets
+        self.total_words = len(words)
+        # Memoize: responses depend only on (p, k) and the table never
+        # changes after load, so repeated offsets reuse the same bytes
+        self._cached_render = functools.lru_cache(maxsize=4096)(self._render_response)
+        # Precompute the aligned k=5 replies the clients actually send;
+        # steady state becomes a single list index
+        self.k_default = 5
+        self.responses = [self._render_response(p, self.k_default)
+                          for p in range(0, self.total_words + self.k_default, self.k_default)]
+        return tuple(words) # immutable: nothing mutates the table after load
 
     def process_request(self, p, k):
-        total_words = len(self.words)
+        if k == self.k_default and p >= 0 and p % self.k_default == 0:
+            idx = p // self.k_default
+            if idx < len(self.responses):
+                return self.responses[idx]
+            return b"EOF\n"
+        return self._cached_render(p, k)
+
+    def _render_response(self, p, k):
+        total_words = self.total_words
         if p >= total_words:
-            return "EOF\n"
-        
+            return b"EOF\n"
+
         end_idx = min(p + k, total_words)
-        requested_words = self.words[p:end_idx]
-        
+        blob = self.words_bytes[self.offsets[p]:self.offsets[end_idx] - 1]
+
         if end_idx >= total_words:
-            return ','.join(requested_words) + ',EOF\n' if requested_words else "EOF\n"
+            return blob + b",EOF\n"
         else:
-            return ','.join(requested_words) + '\n'
+            return blob + b"\n"
 
-    def handle_client_connection(self, client_socket, client_addr):
-        client_id = client_socket.getpeername()
-        self.logger.info(f"Client {client_id} connected and added to RR schedule.")
-        
-        with self.lock:
-            self.client_queues[client_id] = queue.Queue()
-            self.client_order.append(client_id)
-            
-        buffer = b''
-        try:
-            while self.running:
-                data = client_socket.recv(4096)
-                if not data: break
-                buffer += data
-                while b'\n' in buffer:
-                    request_line, buffer = buffer.split(b'\n', 1)
-                    request = request_line.decode('utf-8').strip()
-                    if ',' in request and client_id in self.client_queues:
-                        p, k = map(int, request.split(','))
-                        self.client_queues[client_id].put({'socket': client_socket, 'p': p, 'k': k})
-        except (ConnectionResetError, BrokenPipeError, KeyError):
-            self.logger.warning(f"Client {client_id} disconnected.")
-        finally:
-            with self.lock:
-                if client_id in self.client_queues: del self.client_queues[client_id]
-                if client_id in self.client_order: self.client_order.remove(client_id)
-            client_socket.close()
+    def io_loop(self):
+        # Single epoll-backed reader instead of one blocked-recv thread per
+        # client; requests land in the per-client queues as before
+        sel = selectors.DefaultSelector()
+        self.server_socket.setblocking(False)
+        sel.register(self.server_socket, selectors.EVENT_READ, None)
+        buffers = {}
+        quickack = getattr(socket, 'TCP_QUICKACK', None) # Linux-only
+
+        while self.running:
+            events = sel.select(timeout=0.5)
+            for key, _ in events:
+                sock = key.fileobj
+                if sock is self.server_socket:
+                    try:
+                        client_socket, client_addr = sock.accept()
+                    except OSError:
+                        continue
+                    # Kill Nagle/delayed-ACK stalls on the tiny replies so
+                    # measured completion times reflect scheduling, not TCP
+                    client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                    if quickack is not None:
+                        client_socket.setsockopt(socket.IPPROTO_TCP, quickack, 1)
+                    client_id = client_addr
+                    sel.register(client_socket, selectors.EVENT_READ, client_id)
+                    buffers[client_socket] = bytearray()
+                    with self.lock:
+                        # Plain deque under the existing lock: queue.Queue's
+                        # own Condition machinery is redundant here
+                        self.client_queues[client_id] = deque()
+                        self.client_order.append(client_id)
+                    self.logger.info("Client %s connected and added to RR schedule.", client_id)
+                    continue
+
+                client_id = key.data
+                try:
+                    data = sock.recv(4096)
+                except (ConnectionResetError, OSError):
+                    data = b''
+                if not data:
+                    sel.unregister(sock)
+                    del buffers[sock]
+                    with self.lock:
+                        if client_id in self.client_queues: del self.client_queues[client_id]
+                        if client_id in self.client_order: self.client_order.remove(client_id)
+                    sock.close()
+                    self.logger.warning("Client %s disconnected.", client_id)
+                    continue
+
+                buf = buffers[sock]
+                buf += data
+                while True:
+                    nl = buf.find(b'\n')
+                    if nl < 0:
+                        break
+                    line = bytes(buf[:nl])
+                    del buf[:nl + 1]
+                    # Bytes-level parse: no UTF-8 decode/strip per request
+                    ci = line.find(b',')
+                    if ci < 0 or client_id not in self.client_queues:
+                        continue
+                    try:
+                        p = int(line[:ci])
+                        k = int(line[ci + 1:].rstrip())
+                    except ValueError:
+                        continue
+                    with self.cv:
+                        self.client_queues[client_id].append(Req(sock, p, k, client_id))
+                        self.cv.notify()
+
+        sel.close()
 
     def request_processor(self):
         while self.running:
-            client_to_serve = None
-            with self.lock:
-                if self.client_order:
+            item = None
+            with self.cv:
+                # Rotate through clients looking for queued work under the
+                # already-held lock; block on the condition when everything
+                # is idle instead of burning a core polling at 1 kHz
+                for _ in range(len(self.client_order)):
                     client_to_serve = self.client_order.popleft()
                     self.client_order.append(client_to_serve)
-
-            if client_to_serve and self.client_queues.get(client_to_serve) and not self.client_queues[client_to_serve].empty():
-                try:
-                    item = self.client_queues[client_to_serve].get_nowait()
-                    response = self.process_request(item['p'], item['k'])
-                    
-                    # Base delay from Part 3 + random jitter
-                    base_delay = 0.015  # 15ms, same as Part 3
-                    jitter = random.uniform(0, 0.02) # 0-20ms random jitter
-                    time.sleep(base_delay + jitter)
-                    
-                    item['socket'].sendall(response.encode('utf-8'))
-                except (queue.Empty, KeyError, BrokenPipeError, ConnectionResetError):
+                    dq = self.client_queues.get(client_to_serve)
+                    if dq:
+                        item = dq.popleft()
+                        break
+                if item is None:
+                    self.cv.wait(timeout=0.1)
                     continue
-            else:
-                time.sleep(0.001)
+
+            try:
+                response = self.process_request(item.p, item.k)
+
+                # Base delay from Part 3 + random jitter
+                base_delay = 0.015  # 15ms, same as Part 3
+                jitter = random.uniform(0, 0.02) # 0-20ms random jitter
+                time.sleep(base_delay + jitter)
+
+                item.sock.sendall(response)
+            except (KeyError, BrokenPipeError, ConnectionResetError):
+                continue
 
     def start(self):
         self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -108,14 +191,12 @@ class RoundRobinServer:
         self.server_socket.bind((self.server_ip, self.port))
         self.server_socket.listen(128)
         self.running = True
-        self.logger.info(f"Round-Robin Server on {self.server_ip}:{self.port}")
+        self.logger.info("Round-Robin Server on %s:%s", self.server_ip, self.port)
 
         threading.Thread(target=self.request_processor, daemon=True).start()
 
         try:
-            while self.running:
-                client_socket, client_addr = self.server_socket.accept()
-                threading.Thread(target=self.handle_client_connection, args=(client_socket, client_addr), daemon=True).start()
+            self.io_loop()
         except KeyboardInterrupt:
             self.logger.info("Server shutting down.")
         finally:
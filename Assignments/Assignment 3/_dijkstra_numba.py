@@ -0,0 +1,133 @@
+"""Numba-compiled Dijkstra kernels for the Assignment 3 controllers.
+
+Both kernels work on the CSR arrays the controllers already build.
+`dijkstra_sssp` returns only the distance vector; callers rebuild the
+equal-cost predecessor DAG from the distances, the same way the scipy
+path does. `dijkstra_sssp_prev` also records one predecessor per node
+for the L3 controllers, which need a single shortest path rather than
+all of them. Importing this module fails cleanly when numba is not
+installed, so the controllers treat it as an optional accelerator.
+"""
+import numpy as np
+from numba import njit
+
+
+@njit('float32[::1](int32[::1], int32[::1], float32[::1], int64, int64)',
+      cache=True, fastmath=True)
+def dijkstra_sssp(indptr, indices, weights, src, n):
+    dist = np.full(n, np.inf, dtype=np.float32)
+    dist[src] = 0.0
+
+    # Array-backed binary min-heap: parallel dist/node arrays, no tuple
+    # allocation per push. Strict-less pushes bound total pushes by E,
+    # so E + 2 slots can never overflow.
+    cap = indices.shape[0] + 2
+    heap_d = np.empty(cap, dtype=np.float32)
+    heap_n = np.empty(cap, dtype=np.int32)
+    heap_d[0] = 0.0
+    heap_n[0] = src
+    size = 1
+
+    while size > 0:
+        d = heap_d[0]
+        u = heap_n[0]
+        size -= 1
+        heap_d[0] = heap_d[size]
+        heap_n[0] = heap_n[size]
+        # Sift down
+        i = 0
+        while True:
+            left = 2 * i + 1
+            right = left + 1
+            smallest = i
+            if left < size and heap_d[left] < heap_d[smallest]:
+                smallest = left
+            if right < size and heap_d[right] < heap_d[smallest]:
+                smallest = right
+            if smallest == i:
+                break
+            heap_d[i], heap_d[smallest] = heap_d[smallest], heap_d[i]
+            heap_n[i], heap_n[smallest] = heap_n[smallest], heap_n[i]
+            i = smallest
+
+        if d > dist[u]:
+            continue  # Stale entry (lazy deletion)
+
+        for k in range(indptr[u], indptr[u + 1]):
+            v = indices[k]
+            new_dist = d + weights[k]
+            if new_dist < dist[v]:
+                dist[v] = new_dist
+                # Sift up
+                i = size
+                heap_d[i] = new_dist
+                heap_n[i] = v
+                size += 1
+                while i > 0:
+                    parent = (i - 1) // 2
+                    if heap_d[parent] <= heap_d[i]:
+                        break
+                    heap_d[i], heap_d[parent] = heap_d[parent], heap_d[i]
+                    heap_n[i], heap_n[parent] = heap_n[parent], heap_n[i]
+                    i = parent
+
+    return dist
+
+
+@njit('Tuple((float32[::1], int32[::1]))(int32[::1], int32[::1], float32[::1], int64, int64)',
+      cache=True, fastmath=True)
+def dijkstra_sssp_prev(indptr, indices, weights, src, n):
+    dist = np.full(n, np.inf, dtype=np.float32)
+    prev = np.full(n, -1, dtype=np.int32)
+    dist[src] = 0.0
+
+    cap = indices.shape[0] + 2
+    heap_d = np.empty(cap, dtype=np.float32)
+    heap_n = np.empty(cap, dtype=np.int32)
+    heap_d[0] = 0.0
+    heap_n[0] = src
+    size = 1
+
+    while size > 0:
+        d = heap_d[0]
+        u = heap_n[0]
+        size -= 1
+        heap_d[0] = heap_d[size]
+        heap_n[0] = heap_n[size]
+        i = 0
+        while True:
+            left = 2 * i + 1
+            right = left + 1
+            smallest = i
+            if left < size and heap_d[left] < heap_d[smallest]:
+                smallest = left
+            if right < size and heap_d[right] < heap_d[smallest]:
+                smallest = right
+            if smallest == i:
+                break
+            heap_d[i], heap_d[smallest] = heap_d[smallest], heap_d[i]
+            heap_n[i], heap_n[smallest] = heap_n[smallest], heap_n[i]
+            i = smallest
+
+        if d > dist[u]:
+            continue  # Stale entry (lazy deletion)
+
+        for k in range(indptr[u], indptr[u + 1]):
+            v = indices[k]
+            new_dist = d + weights[k]
+            if new_dist < dist[v]:
+                dist[v] = new_dist
+                prev[v] = u
+                i = size
+                heap_d[i] = new_dist
+                heap_n[i] = v
+                size += 1
+                while i > 0:
+                    parent = (i - 1) // 2
+                    if heap_d[parent] <= heap_d[i]:
+                        break
+                    heap_d[i], heap_d[parent] = heap_d[parent], heap_d[i]
+                    heap_n[i], heap_n[parent] = heap_n[parent], heap_n[i]
+                    i = parent
+
+    return dist, prev
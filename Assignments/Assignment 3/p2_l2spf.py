@@ -3,22 +3,114 @@ from ryu.controller import ofp_event
 from ryu.controller.handler import CONFIG_DISPATCHER, MAIN_DISPATCHER
 from ryu.controller.handler import set_ev_cls
 from ryu.ofproto import ofproto_v1_3
-from ryu.lib.packet import packet
-from ryu.lib.packet import ethernet
 from ryu.lib.packet import ether_types
+import array
 import json
-import heapq
+import logging
 import random
+import struct
+import numpy as np
+
+try:
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import dijkstra as csgraph_dijkstra
+    HAS_SCIPY = True
+except ImportError:
+    HAS_SCIPY = False
+
+try:
+    from _dijkstra_numba import dijkstra_sssp as numba_sssp
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+
+class IntHeap:
+    """Binary min-heap over parallel array.array buffers.
+
+    heapq boxes every (dist, node) pair into a tuple; keeping the two
+    fields in unboxed 'd'/'i' arrays makes the pure-Python Dijkstra
+    fallback allocation-free per push.
+    """
+    __slots__ = ('_d', '_n')
+
+    def __init__(self):
+        self._d = array.array('d')
+        self._n = array.array('i')
+
+    def __len__(self):
+        return len(self._d)
+
+    def push(self, dist, node):
+        d, nodes = self._d, self._n
+        d.append(dist)
+        nodes.append(node)
+        i = len(d) - 1
+        while i > 0:
+            parent = (i - 1) >> 1
+            if d[parent] <= d[i]:
+                break
+            d[i], d[parent] = d[parent], d[i]
+            nodes[i], nodes[parent] = nodes[parent], nodes[i]
+            i = parent
+
+    def pop(self):
+        d, nodes = self._d, self._n
+        top = (d[0], nodes[0])
+        last_d = d.pop()
+        last_n = nodes.pop()
+        size = len(d)
+        if size:
+            d[0] = last_d
+            nodes[0] = last_n
+            i = 0
+            while True:
+                child = 2 * i + 1
+                if child >= size:
+                    break
+                right = child + 1
+                if right < size and d[right] < d[child]:
+                    child = right
+                if d[i] <= d[child]:
+                    break
+                d[i], d[child] = d[child], d[i]
+                nodes[i], nodes[child] = nodes[child], nodes[i]
+                i = child
+        return top
+
 
 class ShortestPathSwitch(app_manager.RyuApp):
     OFP_VERSIONS = [ofproto_v1_3.OFP_VERSION]
 
+    # Static wiring of the 6-switch topology: (src_dpid, dst_dpid) -> port
+    _LINK_PORTS = {
+        (1, 2): 2, (2, 1): 1,
+        (1, 3): 3, (3, 1): 1,
+        (2, 4): 2, (4, 2): 1,
+        (3, 5): 2, (5, 3): 1,
+        (4, 6): 2, (6, 4): 2,
+        (5, 6): 2, (6, 5): 3,
+    }
+
     def __init__(self, *args, **kwargs):
         super(ShortestPathSwitch, self).__init__(*args, **kwargs)
+        # Dense (dpid, dpid) -> out-port table (-1 = no link): integer
+        # indexing replaces tuple hashing in the flow-install loops
+        self.link_port_matrix = np.full((7, 7), -1, dtype=np.int8)
+        for (u, v), port in self._LINK_PORTS.items():
+            self.link_port_matrix[u, v] = port
         self.topology = {}
         self.datapaths = {}
         self.host_location = {}  # Store MAC -> (switch_dpid, port)
-        self.flows_installed = set()  # Track which flows we've installed
+        # Installed host pairs live in a bitmap: each learned MAC gets a
+        # small int id and pair (src, dst) maps to one bit, so the per
+        # packet-in membership test is a shift/mask instead of hashing a
+        # tuple of MAC strings
+        self._mac_to_id = {}
+        self._installed_bits = bytearray(512)  # 64 x 64 host pairs
+        self.all_paths = {}  # (src_switch, dst_switch) -> shortest paths
+        self._match_cache = {}    # (dpid, eth_dst) -> OFPMatch
+        self._actions_cache = {}  # (dpid, out_port) -> [OFPActionOutput]
         self.load_config('config.json')
 
     def load_config(self, config_file):
@@ -35,53 +127,176 @@ class ShortestPathSwitch(app_manager.RyuApp):
                         if weight > 0 and i != j:
                             self.topology[node][nodes[j]] = weight
                 
+                self._build_csr()
+                self._precompute_all_paths()
                 self.logger.info("Loaded topology: %s", self.topology)
                 self.logger.info("ECMP enabled: %s", self.ecmp_enabled)
         except Exception as e:
             self.logger.error("Failed to load config: %s", e)
 
-    def dijkstra(self, graph, start, end):
-        pq = [(0, start, [start])]
-        visited = {}
-        shortest_distance = None
-        all_shortest_paths = []
-        
+    def _build_csr(self):
+        # scipy-style CSR mirror of the topology: integer node ids plus
+        # flat indptr/indices/weights arrays so the Dijkstra inner loop
+        # indexes arrays instead of hashing node-name strings
+        self.node_ids = {node: i for i, node in enumerate(self.topology)}
+        self.id_to_node = list(self.topology)
+        # Paths are handed around as int dpids end-to-end; 's{n}' strings
+        # are only formatted for log messages
+        self.id_to_dpid = [int(node[1:]) for node in self.id_to_node]
+        indptr = [0]
+        indices = []
+        weights = []
+        for node in self.id_to_node:
+            for neighbor, weight in self.topology[node].items():
+                indices.append(self.node_ids[neighbor])
+                weights.append(weight)
+            indptr.append(len(indices))
+        self.adj_indptr = np.asarray(indptr, dtype=np.int32)
+        self.adj_indices = np.asarray(indices, dtype=np.int32)
+        self.adj_weights = np.asarray(weights, dtype=np.float32)
+        if HAS_SCIPY:
+            n = len(self.id_to_node)
+            self.csr = csr_matrix((self.adj_weights, self.adj_indices, self.adj_indptr), shape=(n, n))
+
+    def _sssp(self, src_id):
+        # Heap entries carry only (dist, id); equal-cost predecessors go
+        # into pred and shortest paths are rebuilt from the DAG, so no path
+        # list is copied per relaxation
+        n = len(self.id_to_node)
+        dist = np.full(n, np.inf, dtype=np.float32)
+        dist[src_id] = 0.0
+        pred = [[] for _ in range(n)]
+        indptr = self.adj_indptr
+        indices = self.adj_indices
+        weights = self.adj_weights
+        pq = IntHeap()
+        pq.push(0.0, src_id)
+
         while pq:
-            dist, node, path = heapq.heappop(pq)
-            
-            if shortest_distance is not None and dist > shortest_distance:
-                break
-                
-            if node == end:
-                if shortest_distance is None:
-                    shortest_distance = dist
-                if dist == shortest_distance:
-                    all_shortest_paths.append(path)
+            d, u = pq.pop()
+
+            if d > dist[u]:
+                continue  # Stale heap entry (lazy deletion)
+
+            for k in range(indptr[u], indptr[u + 1]):
+                v = indices[k]
+                new_dist = d + weights[k]
+                if new_dist < dist[v]:
+                    dist[v] = new_dist
+                    pred[v] = [u]
+                    pq.push(new_dist, v)
+                elif new_dist == dist[v]:
+                    pred[v].append(u)
+
+        return dist, pred
+
+    def _paths_from_pred(self, pred, src_id, dst_id):
+        # Enumerate all equal-cost paths by walking the predecessor DAG
+        # back from dst to src, translating ids to names at the end
+        all_shortest_paths = []
+        stack = [(dst_id, [dst_id])]
+        while stack:
+            node, path = stack.pop()
+            if node == src_id:
+                all_shortest_paths.append([self.id_to_dpid[i] for i in reversed(path)])
                 continue
-            
-            if node in visited and visited[node] < dist:
+            for prev in pred[node]:
+                stack.append((prev, path + [prev]))
+        return all_shortest_paths
+
+    def dijkstra(self, graph, start, end):
+        src_id = self.node_ids.get(start)
+        dst_id = self.node_ids.get(end)
+        if src_id is None or dst_id is None:
+            return None, []
+        dist, pred = self._sssp(src_id)
+        if not np.isfinite(dist[dst_id]):
+            return None, []
+        return float(dist[dst_id]), self._paths_from_pred(pred, src_id, dst_id)
+
+    def _pred_from_dist(self, dist):
+        # Rebuild the equal-cost predecessor DAG from a distance vector:
+        # edge u->v is on some shortest path iff dist[u] + w == dist[v]
+        n = len(self.id_to_node)
+        indptr = self.adj_indptr
+        indices = self.adj_indices
+        weights = self.adj_weights
+        pred = [[] for _ in range(n)]
+        for u in range(n):
+            if not np.isfinite(dist[u]):
                 continue
-            visited[node] = dist
-            
-            if node in graph:
-                for neighbor, weight in graph[node].items():
-                    if neighbor not in path:
-                        new_dist = dist + weight
-                        new_path = path + [neighbor]
-                        heapq.heappush(pq, (new_dist, neighbor, new_path))
-        
-        return shortest_distance, all_shortest_paths
+            for k in range(indptr[u], indptr[u + 1]):
+                v = indices[k]
+                if abs(dist[u] + weights[k] - dist[v]) < 1e-6:
+                    pred[v].append(u)
+        return pred
+
+    def _precompute_all_paths(self):
+        # Scipy's csgraph dijkstra runs all sources in one native call;
+        # the hand-written heap loop is only the import fallback. Either
+        # way packet-in just does a dict lookup afterwards.
+        self.all_paths = {}
+        dpids = self.id_to_dpid
+        if HAS_SCIPY:
+            dist_matrix = csgraph_dijkstra(self.csr)
+            for src_id, src_dpid in enumerate(dpids):
+                pred = self._pred_from_dist(dist_matrix[src_id])
+                for dst_id, dst_dpid in enumerate(dpids):
+                    if dst_id != src_id and np.isfinite(dist_matrix[src_id][dst_id]):
+                        self.all_paths[(src_dpid, dst_dpid)] = self._paths_from_pred(pred, src_id, dst_id)
+            return
+        n = len(self.id_to_node)
+        for src_id, src_dpid in enumerate(dpids):
+            if HAS_NUMBA:
+                # JITed kernel over the same CSR arrays; DAG comes from
+                # the distance vector like the scipy path
+                dist = numba_sssp(self.adj_indptr, self.adj_indices, self.adj_weights, src_id, n)
+                pred = self._pred_from_dist(dist)
+            else:
+                dist, pred = self._sssp(src_id)
+            for dst_id, dst_dpid in enumerate(dpids):
+                if dst_id != src_id and np.isfinite(dist[dst_id]):
+                    self.all_paths[(src_dpid, dst_dpid)] = self._paths_from_pred(pred, src_id, dst_id)
+
+    def _pair_bit(self, src, dst):
+        sid = self._mac_to_id.setdefault(src, len(self._mac_to_id))
+        did = self._mac_to_id.setdefault(dst, len(self._mac_to_id))
+        return sid * 64 + did
+
+    def _flow_installed(self, bit):
+        return (self._installed_bits[bit >> 3] >> (bit & 7)) & 1
+
+    def _mark_installed(self, bit):
+        self._installed_bits[bit >> 3] |= 1 << (bit & 7)
+
+    @staticmethod
+    def _mac_str(mac):
+        return ':'.join('%02x' % b for b in mac)
+
+    def _cached_match(self, parser, dpid, eth_dst):
+        # Only O(hosts x switches) distinct matches exist; build each once
+        # instead of re-marshalling the same OFPMatch per hop install
+        key = (dpid, eth_dst)
+        match = self._match_cache.get(key)
+        if match is None:
+            match = parser.OFPMatch(eth_dst=self._mac_str(eth_dst))
+            self._match_cache[key] = match
+        return match
+
+    def _cached_actions(self, parser, dpid, out_port):
+        key = (dpid, out_port)
+        actions = self._actions_cache.get(key)
+        if actions is None:
+            actions = [parser.OFPActionOutput(out_port)]
+            self._actions_cache[key] = actions
+        return actions
+
+    def get_link_port_int(self, u_dpid, v_dpid):
+        port = self.link_port_matrix[u_dpid, v_dpid]
+        return int(port) if port >= 0 else None
 
     def get_link_port(self, src_switch, dst_switch):
-        port_map = {
-            ('s1', 's2'): 2, ('s2', 's1'): 1,
-            ('s1', 's3'): 3, ('s3', 's1'): 1,
-            ('s2', 's4'): 2, ('s4', 's2'): 1,
-            ('s3', 's5'): 2, ('s5', 's3'): 1,
-            ('s4', 's6'): 2, ('s6', 's4'): 2,
-            ('s5', 's6'): 2, ('s6', 's5'): 3,
-        }
-        return port_map.get((src_switch, dst_switch), None)
+        return self.get_link_port_int(int(src_switch[1:]), int(dst_switch[1:]))
 
     @set_ev_cls(ofp_event.EventOFPSwitchFeatures, CONFIG_DISPATCHER)
     def switch_features_handler(self, ev):
@@ -117,102 +332,87 @@ class ShortestPathSwitch(app_manager.RyuApp):
         in_port = msg.match['in_port']
         dpid = datapath.id
 
-        pkt = packet.Packet(msg.data)
-        eth = pkt.get_protocols(ethernet.ethernet)[0]
+        # Slice the Ethernet header straight out of the frame instead of
+        # building Ryu's full packet.Packet object tree; only the MACs and
+        # ethertype are needed here. MACs stay raw bytes as dict keys and
+        # are formatted to colon strings only for matches and log lines.
+        raw = msg.data
+        dst = raw[0:6]
+        src = raw[6:12]
+        ethertype, = struct.unpack_from('!H', raw, 12)
 
-        if eth.ethertype == ether_types.ETH_TYPE_LLDP:
+        if ethertype == ether_types.ETH_TYPE_LLDP:
             return
 
-        dst = eth.dst
-        src = eth.src
-
         # Learn source location ONLY if it's from port 1 (host ports on s1 and s6)
         if in_port == 1 and (dpid == 1 or dpid == 6):
             if src not in self.host_location:
                 self.host_location[src] = (dpid, in_port)
-                self.logger.info("Learned host %s on s%d port %d", src, dpid, in_port)
+                self.logger.info("Learned host %s on s%d port %d", self._mac_str(src), dpid, in_port)
 
         # If we know both hosts' locations, install bidirectional flows
         if src in self.host_location and dst in self.host_location:
-            flow_key = (src, dst)
-            reverse_key = (dst, src)
-            
-            if flow_key not in self.flows_installed:
+            flow_bit = self._pair_bit(src, dst)
+            reverse_bit = self._pair_bit(dst, src)
+
+            if not self._flow_installed(flow_bit):
                 src_dpid, src_port = self.host_location[src]
                 dst_dpid, dst_port = self.host_location[dst]
                 
                 if src_dpid != dst_dpid:
-                    src_switch = f's{src_dpid}'
-                    dst_switch = f's{dst_dpid}'
-                    
-                    distance, paths = self.dijkstra(self.topology, src_switch, dst_switch)
-                    
+                    # All pairs were precomputed at config load; paths are
+                    # lists of int dpids end-to-end
+                    paths = self.all_paths.get((src_dpid, dst_dpid), [])
+
                     if paths:
                         # Select path based on ECMP setting
                         if self.ecmp_enabled and len(paths) > 1:
                             path = random.choice(paths)
-                            self.logger.info("ECMP: Selected path %s from %d paths", path, len(paths))
                         else:
                             path = paths[0]
-                        
-                        self.logger.info("Selected path: %s for %s->%s", path, src, dst)
-                        
-                        # Install flows along the path (src -> dst)
+
+                        # Guard so MAC formatting and argument tuples are
+                        # skipped entirely when INFO logging is off
+                        if self.logger.isEnabledFor(logging.INFO):
+                            if self.ecmp_enabled and len(paths) > 1:
+                                self.logger.info("ECMP: Selected path %s from %d paths", path, len(paths))
+                            self.logger.info("Selected path: %s for %s->%s", path, self._mac_str(src), self._mac_str(dst))
+
+                        # One walk installs both directions: at edge (u, v)
+                        # the forward rule (match dst) goes on u and the
+                        # reverse rule (match src) on v, with both out
+                        # ports read from the symmetric port matrix.
+                        # Mods are grouped per datapath so each switch's
+                        # socket writes stay contiguous.
+                        per_switch = {}
                         for i in range(len(path) - 1):
-                            curr_sw = path[i]
-                            next_sw = path[i + 1]
-                            curr_dpid = int(curr_sw[1:])
-                            curr_datapath = self.datapaths.get(curr_dpid)
-                            
-                            if curr_datapath:
-                                curr_parser = curr_datapath.ofproto_parser  # FIXED: Use correct parser
-                                out_port = self.get_link_port(curr_sw, next_sw)
-                                if out_port:
-                                    match = curr_parser.OFPMatch(eth_dst=dst)  # FIXED: Match only on dst
-                                    actions = [curr_parser.OFPActionOutput(out_port)]
-                                    self.add_flow(curr_datapath, 10, match, actions, idle_timeout=300)
-                        
-                        # Final hop (src -> dst)
-                        dst_datapath = self.datapaths.get(dst_dpid)
-                        if dst_datapath:
-                            dst_parser = dst_datapath.ofproto_parser  # FIXED: Use correct parser
-                            match = dst_parser.OFPMatch(eth_dst=dst)  # FIXED: Match only on dst
-                            actions = [dst_parser.OFPActionOutput(dst_port)]
-                            self.add_flow(dst_datapath, 10, match, actions, idle_timeout=300)
-                        
-                        self.flows_installed.add(flow_key)
-                        self.logger.info("Installed flows for %s -> %s", src, dst)
-                        
-                        # ADDED: Install reverse direction flows (dst -> src)
-                        if reverse_key not in self.flows_installed:
-                            self.logger.info("Installing reverse flows for %s -> %s", dst, src)
-                            reverse_path = list(reversed(path))
-                            
-                            # Install flows along reverse path
-                            for i in range(len(reverse_path) - 1):
-                                curr_sw = reverse_path[i]
-                                next_sw = reverse_path[i + 1]
-                                curr_dpid = int(curr_sw[1:])
-                                curr_datapath = self.datapaths.get(curr_dpid)
-                                
-                                if curr_datapath:
-                                    curr_parser = curr_datapath.ofproto_parser
-                                    out_port = self.get_link_port(curr_sw, next_sw)
-                                    if out_port:
-                                        match = curr_parser.OFPMatch(eth_dst=src)
-                                        actions = [curr_parser.OFPActionOutput(out_port)]
-                                        self.add_flow(curr_datapath, 10, match, actions, idle_timeout=300)
-                            
-                            # Final hop for reverse (dst -> src)
-                            src_datapath = self.datapaths.get(src_dpid)
-                            if src_datapath:
-                                src_parser = src_datapath.ofproto_parser
-                                match = src_parser.OFPMatch(eth_dst=src)
-                                actions = [src_parser.OFPActionOutput(src_port)]
-                                self.add_flow(src_datapath, 10, match, actions, idle_timeout=300)
-                            
-                            self.flows_installed.add(reverse_key)
-                            self.logger.info("Installed reverse flows for %s -> %s", dst, src)
+                            u, v = path[i], path[i + 1]
+                            fwd_port = self.get_link_port_int(u, v)
+                            rev_port = self.get_link_port_int(v, u)
+                            if fwd_port:
+                                per_switch.setdefault(u, []).append((dst, fwd_port))
+                            if rev_port:
+                                per_switch.setdefault(v, []).append((src, rev_port))
+
+                        # Edge-host hops: deliver to dst at its switch and
+                        # to src at its switch
+                        per_switch.setdefault(dst_dpid, []).append((dst, dst_port))
+                        per_switch.setdefault(src_dpid, []).append((src, src_port))
+
+                        for sw_dpid, rules in per_switch.items():
+                            sw_datapath = self.datapaths.get(sw_dpid)
+                            if not sw_datapath:
+                                continue
+                            sw_parser = sw_datapath.ofproto_parser
+                            for eth_dst, out_port in rules:
+                                match = self._cached_match(sw_parser, sw_dpid, eth_dst)
+                                actions = self._cached_actions(sw_parser, sw_dpid, out_port)
+                                self.add_flow(sw_datapath, 10, match, actions, idle_timeout=300)
+
+                        self._mark_installed(flow_bit)
+                        self._mark_installed(reverse_bit)
+                        if self.logger.isEnabledFor(logging.INFO):
+                            self.logger.info("Installed bidirectional flows for %s <-> %s", self._mac_str(src), self._mac_str(dst))
 
         # Send packet out (flood if unknown)
         if dst in self.host_location:
@@ -4,8 +4,30 @@ from ryu.controller.handler import CONFIG_DISPATCHER, MAIN_DISPATCHER
 from ryu.controller.handler import set_ev_cls
 from ryu.ofproto import ofproto_v1_3
 from ryu.lib.packet import packet, ethernet, ether_types, arp, ipv4
+from ryu.lib import addrconv
 import json
 import heapq
+import logging
+import socket
+import struct
+import numpy as np
+
+try:
+    from _dijkstra_numba import dijkstra_sssp_prev as numba_sssp_prev
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+
+# Specialized match constructor emitted via codegen at import time. The
+# controller installs exactly one match shape (eth_type + ipv4_dst), so a
+# dedicated positional builder skips reassembling the kwargs dict per hop
+# and gives a single callable to compile later if needed.
+_MATCH_BUILDER_SRC = (
+    "def _mk_match_ipdst(parser, dst_ip):\n"
+    "    return parser.OFPMatch(eth_type=0x0800, ipv4_dst=dst_ip)\n"
+)
+exec(_MATCH_BUILDER_SRC)
 
 
 class L3ShortestPathSwitch(app_manager.RyuApp):
@@ -19,7 +41,19 @@ class L3ShortestPathSwitch(app_manager.RyuApp):
         self.host_info = {}
         self.port_to_mac = {}
         self.port_name_to_num = {}
-        self.flows_installed = set()
+        self.flows_installed = set()  # Packed u64 (src_ip, dst_ip) keys
+        self._ip_u32 = {}  # dotted-quad -> packed u32
+        self._ip_mac_cache = {}  # Memoized ip_to_mac resolutions
+        self._arp_template = {}  # target_ip -> serialized proxy-reply frame
+        self._pending_reinject = {}  # dpid -> [(in_port, data)] awaiting barrier
+        self._pending_mods = {}  # dpid -> [OFPFlowMod] buffered per path install
+        self._egress_template = {}  # (dpid, neighbor) -> (out_port, src_mac, next_hop_mac)
+        self._action_cache = {}  # (dpid, neighbor) -> shared action list
+        self.ip_to_switch = {}
+        self.ip_to_host_name = {}
+        self.name_to_dpid = {}
+        self.routing_table = {}  # (src_switch, dst_switch) -> (dist, path)
+        self.topo_version = 0
         self.load_config('p3_config.json')
 
     def load_config(self, config_file):
@@ -37,6 +71,12 @@ class L3ShortestPathSwitch(app_manager.RyuApp):
                     self.switch_info[dpid] = switch
                     self.logger.info("Loaded switch: %s (dpid=%d)", switch['name'], dpid)
                 
+                # Reverse indices so per-flow lookups are dict hits
+                # instead of scans over host_info/switch_info
+                self.ip_to_switch = {h['ip']: h['switch'] for h in config.get('hosts', [])}
+                self.ip_to_host_name = {h['ip']: h['name'] for h in config.get('hosts', [])}
+                self.name_to_dpid = {cfg['name']: d for d, cfg in self.switch_info.items()}
+                
                 for link in config.get('links', []):
                     src = link['src']
                     dst = link['dst']
@@ -47,16 +87,22 @@ class L3ShortestPathSwitch(app_manager.RyuApp):
                     self.topology[src][dst] = cost
                 
                 self.logger.info("Topology graph: %s", self.topology)
+                self._rebuild_apsp()
         except Exception as e:
             self.logger.error("Failed to load config: %s", e)
 
     def dijkstra(self, graph, start, end):
         """Compute shortest path using Dijkstra's algorithm"""
-        pq = [(0, start, [start])]
+        # Heap entries are (dist, node) scalars only; the path is rebuilt
+        # once at the end from the prev map instead of copying a growing
+        # list into the heap on every relaxation
+        dist = {start: 0}
+        prev = {}
         visited = set()
+        pq = [(0, start)]
         
         while pq:
-            dist, node, path = heapq.heappop(pq)
+            d, node = heapq.heappop(pq)
             
             if node in visited:
                 continue
@@ -64,16 +110,94 @@ class L3ShortestPathSwitch(app_manager.RyuApp):
             visited.add(node)
             
             if node == end:
-                return dist, path
+                path = [end]
+                while node != start:
+                    node = prev[node]
+                    path.append(node)
+                path.reverse()
+                return d, path
             
             for neighbor, weight in graph.get(node, {}).items():
                 if neighbor not in visited:
-                    new_dist = dist + weight
-                    new_path = path + [neighbor]
-                    heapq.heappush(pq, (new_dist, neighbor, new_path))
+                    new_dist = d + weight
+                    if new_dist < dist.get(neighbor, float('inf')):
+                        dist[neighbor] = new_dist
+                        prev[neighbor] = node
+                        heapq.heappush(pq, (new_dist, neighbor))
         
         return None, None
 
+
+    def _build_csr(self):
+        """Build CSR adjacency arrays for the current topology"""
+        self.sw_id = {name: i for i, name in enumerate(self.topology)}
+        self.id_to_sw = list(self.topology)
+        indptr = [0]
+        indices = []
+        weights = []
+        for name in self.id_to_sw:
+            for neighbor, cost in self.topology[name].items():
+                nid = self.sw_id.get(neighbor)
+                if nid is not None:
+                    indices.append(nid)
+                    weights.append(cost)
+            indptr.append(len(indices))
+        self.adj_indptr = np.asarray(indptr, dtype=np.int32)
+        self.adj_indices = np.asarray(indices, dtype=np.int32)
+        self.adj_weights = np.asarray(weights, dtype=np.float32)
+
+    def _rebuild_apsp(self):
+        """Recompute the all-pairs routing table for the current topology"""
+        self.topo_version += 1
+        self.routing_table = {}
+        self._build_csr()
+        if HAS_NUMBA:
+            # JIT-compiled relaxation over the CSR arrays; one call per
+            # source, with paths rebuilt from the returned prev array
+            n = len(self.id_to_sw)
+            for sid, src in enumerate(self.id_to_sw):
+                dist, prev = numba_sssp_prev(self.adj_indptr, self.adj_indices,
+                                             self.adj_weights, sid, n)
+                for did in range(n):
+                    if did == sid or prev[did] < 0:
+                        continue
+                    path = [self.id_to_sw[did]]
+                    node = did
+                    while node != sid:
+                        node = prev[node]
+                        path.append(self.id_to_sw[node])
+                    path.reverse()
+                    self.routing_table[(src, self.id_to_sw[did])] = (float(dist[did]), path)
+            return
+        for src in self.topology:
+            # One full single-source Dijkstra per source covers every
+            # destination, so per-flow lookups become dict hits
+            dist = {src: 0}
+            prev = {}
+            visited = set()
+            pq = [(0, src)]
+            while pq:
+                d, node = heapq.heappop(pq)
+                if node in visited:
+                    continue
+                visited.add(node)
+                for neighbor, weight in self.topology.get(node, {}).items():
+                    new_dist = d + weight
+                    if neighbor not in visited and new_dist < dist.get(neighbor, float('inf')):
+                        dist[neighbor] = new_dist
+                        prev[neighbor] = node
+                        heapq.heappush(pq, (new_dist, neighbor))
+            for dst, d in dist.items():
+                if dst == src:
+                    continue
+                path = [dst]
+                node = dst
+                while node != src:
+                    node = prev[node]
+                    path.append(node)
+                path.reverse()
+                self.routing_table[(src, dst)] = (d, path)
+
     def get_switch_name(self, dpid):
         """Get switch name from dpid"""
         if dpid in self.switch_info:
@@ -104,19 +228,29 @@ class L3ShortestPathSwitch(app_manager.RyuApp):
 
     def ip_to_mac(self, ip_str):
         """Resolve IP to MAC address"""
+        # The mapping is static between port-desc replies, so memoize and
+        # skip the per-switch interface scan on repeat resolutions
+        mac = self._ip_mac_cache.get(ip_str)
+        if mac:
+            return mac
+        
         if ip_str in self.host_info:
-            return self.host_info[ip_str]['mac']
+            mac = self.host_info[ip_str]['mac']
+            self._ip_mac_cache[ip_str] = mac
+            return mac
         
         for dpid, switch in self.switch_info.items():
             for intf in switch['interfaces']:
                 if intf['ip'] == ip_str:
                     if intf.get('mac') and intf['mac'] != 'auto':
+                        self._ip_mac_cache[ip_str] = intf['mac']
                         return intf['mac']
                     
                     port_num = self.get_port_by_interface_name(dpid, intf['name'])
                     if port_num:
                         mac = self.get_mac_by_port(dpid, port_num)
                         if mac:
+                            self._ip_mac_cache[ip_str] = mac
                             return mac
         
         return None
@@ -135,6 +269,13 @@ class L3ShortestPathSwitch(app_manager.RyuApp):
                                          ofproto.OFPCML_NO_BUFFER)]
         self.add_flow(datapath, 0, match, actions)
         
+        # Drop multicast/limited-broadcast in the data plane so these
+        # packets never cost a controller round-trip; handle_ip ignores
+        # them anyway
+        for dst_range in (('224.0.0.0', '240.0.0.0'), ('255.0.0.0', '255.0.0.0')):
+            drop_match = parser.OFPMatch(eth_type=0x0800, ipv4_dst=dst_range)
+            self.add_flow(datapath, 5, drop_match, [])
+        
         self.send_port_desc_stats_request(datapath)
         
         switch_name = self.get_switch_name(dpid)
@@ -168,8 +309,13 @@ class L3ShortestPathSwitch(app_manager.RyuApp):
                 
                 self.logger.info("Port mapping: %s = port %d (MAC: %s)", 
                                port_name, port_no, port_mac)
+        
+        # New port MACs may change 'auto' interface resolutions
+        self._ip_mac_cache.clear()
+        self._egress_template.clear()
+        self._action_cache.clear()
 
-    def add_flow(self, datapath, priority, match, actions, idle_timeout=0):
+    def add_flow(self, datapath, priority, match, actions, idle_timeout=0, batch=False):
         """Add flow entry to switch"""
         ofproto = datapath.ofproto
         parser = datapath.ofproto_parser
@@ -178,7 +324,25 @@ class L3ShortestPathSwitch(app_manager.RyuApp):
         mod = parser.OFPFlowMod(datapath=datapath, priority=priority,
                                match=match, instructions=inst,
                                idle_timeout=idle_timeout)
-        datapath.send_msg(mod)
+        if batch:
+            # Buffered; install_path_flows flushes per switch in one burst
+            self._pending_mods.setdefault(datapath.id, []).append(mod)
+        else:
+            datapath.send_msg(mod)
+
+
+    def _flow_id(self, src_ip, dst_ip):
+        """Pack a (src_ip, dst_ip) pair into one 64-bit int"""
+        # Int keys hash faster and sit smaller in the set than a tuple of
+        # two strings; the packed u32 per address is cached
+        cache = self._ip_u32
+        a = cache.get(src_ip)
+        if a is None:
+            cache[src_ip] = a = struct.unpack('!I', socket.inet_aton(src_ip))[0]
+        b = cache.get(dst_ip)
+        if b is None:
+            cache[dst_ip] = b = struct.unpack('!I', socket.inet_aton(dst_ip))[0]
+        return (a << 32) | b
 
     @set_ev_cls(ofp_event.EventOFPPacketIn, MAIN_DISPATCHER)
     def packet_in_handler(self, ev):
@@ -186,21 +350,22 @@ class L3ShortestPathSwitch(app_manager.RyuApp):
         datapath = msg.datapath
         in_port = msg.match['in_port']
         
-        pkt = packet.Packet(msg.data)
-        eth = pkt.get_protocols(ethernet.ethernet)[0]
-        
-        if eth.ethertype == ether_types.ETH_TYPE_LLDP:
+        # Peek at the ethertype bytes before paying for packet parsing;
+        # topology-discovery LLDP arrives constantly and is dropped anyway
+        ethertype = struct.unpack_from('!H', msg.data, 12)[0]
+        if ethertype == ether_types.ETH_TYPE_LLDP:
             return
         
-        arp_pkt = pkt.get_protocol(arp.arp)
-        if arp_pkt:
-            self.handle_arp(datapath, in_port, eth, arp_pkt)
-            return
-        
-        ip_pkt = pkt.get_protocol(ipv4.ipv4)
-        if ip_pkt:
-            self.handle_ip(datapath, in_port, eth, ip_pkt, msg)
-            return
+        pkt = packet.Packet(msg.data)
+        eth = pkt.protocols[0]
+        
+        # ARP and IP are mutually exclusive, so branch on the ethertype
+        # and take the already-parsed L3 object directly instead of
+        # walking the protocol list once per get_protocol call
+        if ethertype == ether_types.ETH_TYPE_ARP:
+            self.handle_arp(datapath, in_port, eth, pkt.protocols[1])
+        elif ethertype == ether_types.ETH_TYPE_IP:
+            self.handle_ip(datapath, in_port, eth, pkt.protocols[1], msg)
 
     def handle_arp(self, datapath, in_port, eth, arp_pkt):
         """Handle ARP requests by proxying replies"""
@@ -210,11 +375,13 @@ class L3ShortestPathSwitch(app_manager.RyuApp):
         
         if arp_pkt.opcode == arp.ARP_REQUEST:
             target_ip = arp_pkt.dst_ip
-            target_mac = self.ip_to_mac(target_ip)
             
-            if target_mac:
-                self.logger.info("ARP Request for %s -> replying with %s", 
-                               target_ip, target_mac)
+            buf = self._arp_template.get(target_ip)
+            if buf is None:
+                target_mac = self.ip_to_mac(target_ip)
+                if not target_mac:
+                    self.logger.warning("ARP Request for unknown IP: %s", target_ip)
+                    return
                 
                 arp_reply = packet.Packet()
                 arp_reply.add_protocol(ethernet.ethernet(
@@ -228,17 +395,29 @@ class L3ShortestPathSwitch(app_manager.RyuApp):
                     dst_mac=arp_pkt.src_mac,
                     dst_ip=arp_pkt.src_ip))
                 arp_reply.serialize()
-                
-                actions = [parser.OFPActionOutput(in_port)]
-                out = parser.OFPPacketOut(
-                    datapath=datapath,
-                    buffer_id=ofproto.OFP_NO_BUFFER,
-                    in_port=ofproto.OFPP_CONTROLLER,
-                    actions=actions,
-                    data=arp_reply.data)
-                datapath.send_msg(out)
+                # Everything except the requester fields is constant per
+                # target IP; keep the serialized frame as a template
+                buf = bytearray(arp_reply.data)
+                self._arp_template[target_ip] = buf
             else:
-                self.logger.warning("ARP Request for unknown IP: %s", target_ip)
+                # Patch the requester fields in place instead of building
+                # and serializing fresh protocol objects: eth.dst at
+                # bytes 0-5, arp.dst_mac at 32-37, arp.dst_ip at 38-41
+                requester_mac = addrconv.mac.text_to_bin(arp_pkt.src_mac)
+                buf[0:6] = requester_mac
+                buf[32:38] = requester_mac
+                buf[38:42] = addrconv.ipv4.text_to_bin(arp_pkt.src_ip)
+            
+            self.logger.debug("ARP Request for %s -> proxy reply", target_ip)
+            
+            actions = [parser.OFPActionOutput(in_port)]
+            out = parser.OFPPacketOut(
+                datapath=datapath,
+                buffer_id=ofproto.OFP_NO_BUFFER,
+                in_port=ofproto.OFPP_CONTROLLER,
+                actions=actions,
+                data=bytes(buf))
+            datapath.send_msg(out)
 
     def handle_ip(self, datapath, in_port, eth, ip_pkt, msg):
         """Handle IP packets and install flows only at source switch"""
@@ -250,59 +429,71 @@ class L3ShortestPathSwitch(app_manager.RyuApp):
         dst_ip = ip_pkt.dst
         current_switch = self.get_switch_name(dpid)
         
-        self.logger.info("IP packet at switch %s: %s -> %s (TTL=%d)",
-                        current_switch, src_ip, dst_ip, ip_pkt.ttl)
+        # Per-packet log demoted to debug: this fires on every packet-in
+        self.logger.debug("IP packet at switch %s: %s -> %s (TTL=%d)",
+                         current_switch, src_ip, dst_ip, ip_pkt.ttl)
         
         if dst_ip.startswith('224.') or dst_ip.startswith('255.'):
             return
         
         if ip_pkt.ttl <= 1:
-            self.logger.info("TTL expired, dropping packet")
+            self.logger.debug("TTL expired, dropping packet")
             return
         
-        flow_key = (src_ip, dst_ip)
+        flow_key = self._flow_id(src_ip, dst_ip)
         
         if flow_key in self.flows_installed:
             return
         
-        src_switch = None
-        for host_ip, host_cfg in self.host_info.items():
-            if host_ip == src_ip:
-                src_switch = host_cfg['switch']
-                break
+        src_switch = self.ip_to_switch.get(src_ip)
         
         if current_switch == src_switch:
             if self.install_path_flows(src_ip, dst_ip):
                 self.flows_installed.add(flow_key)
                 
-                import time
-                time.sleep(0.1)
-                
-                out = parser.OFPPacketOut(
-                    datapath=datapath,
-                    buffer_id=ofproto.OFP_NO_BUFFER,
-                    in_port=in_port,
-                    actions=[parser.OFPActionOutput(ofproto.OFPP_TABLE)],
-                    data=msg.data)
-                datapath.send_msg(out)
-                self.logger.info("Re-injected first packet")
+                # Re-inject once the switch acknowledges a barrier instead
+                # of sleeping 100ms on the event loop: the flow mods are
+                # guaranteed processed before the packet-out hits the table
+                self._pending_reinject.setdefault(dpid, []).append((in_port, msg.data))
+                datapath.send_msg(parser.OFPBarrierRequest(datapath))
+
+
+    @set_ev_cls(ofp_event.EventOFPBarrierReply, MAIN_DISPATCHER)
+    def barrier_reply_handler(self, ev):
+        """Re-inject packets once the switch confirms their flows"""
+        datapath = ev.msg.datapath
+        pending = self._pending_reinject.pop(datapath.id, None)
+        if not pending:
+            return
+        
+        ofproto = datapath.ofproto
+        parser = datapath.ofproto_parser
+        for in_port, data in pending:
+            out = parser.OFPPacketOut(
+                datapath=datapath,
+                buffer_id=ofproto.OFP_NO_BUFFER,
+                in_port=in_port,
+                actions=[parser.OFPActionOutput(ofproto.OFPP_TABLE)],
+                data=data)
+            datapath.send_msg(out)
+        self.logger.info("Re-injected %d packet(s) after barrier", len(pending))
 
     def install_path_flows(self, src_ip, dst_ip):
         """Install bidirectional flows for communication between src_ip and dst_ip"""
-        src_switch = None
-        dst_switch = None
-        
-        for host_ip, host_cfg in self.host_info.items():
-            if host_ip == src_ip:
-                src_switch = host_cfg['switch']
-            if host_ip == dst_ip:
-                dst_switch = host_cfg['switch']
+        src_switch = self.ip_to_switch.get(src_ip)
+        dst_switch = self.ip_to_switch.get(dst_ip)
         
         if not src_switch or not dst_switch:
             self.logger.error("Cannot find switches for %s <-> %s", src_ip, dst_ip)
             return False
         
-        distance, path = self.dijkstra(self.topology, src_switch, dst_switch)
+        if src_switch == dst_switch:
+            # Intra-switch flow: the single-node path installs only the
+            # host-delivery rule, no route lookup needed
+            distance, path = 0, [src_switch]
+        else:
+            # Paths were precomputed for the current topology version
+            distance, path = self.routing_table.get((src_switch, dst_switch), (None, None))
         
         if not path:
             self.logger.error("No path found from %s to %s", src_switch, dst_switch)
@@ -310,97 +501,133 @@ class L3ShortestPathSwitch(app_manager.RyuApp):
         
         self.logger.info("Installing flows for path: %s (cost=%d)", path, distance)
         
-        self._install_unidirectional_flows(path, src_ip, dst_ip)
+        self._install_bidirectional(path, src_ip, dst_ip)
         
-        reverse_path = list(reversed(path))
-        self._install_unidirectional_flows(reverse_path, dst_ip, src_ip)
+        # Flush the buffered mods switch by switch, each burst capped by
+        # one barrier, instead of a socket write per hop per direction
+        for dpid, mods in self._pending_mods.items():
+            dp = self.datapaths.get(dpid)
+            if not dp:
+                continue
+            for mod in mods:
+                dp.send_msg(mod)
+            dp.send_msg(dp.ofproto_parser.OFPBarrierRequest(dp))
+        self._pending_mods.clear()
         
         return True
 
-    def _install_unidirectional_flows(self, path, src_ip, dst_ip):
-        """Install flows along a path for src_ip -> dst_ip"""
-        for i in range(len(path)):
-            switch_name = path[i]
-            
-            switch_dpid = None
-            for did, cfg in self.switch_info.items():
-                if cfg['name'] == switch_name:
-                    switch_dpid = did
-                    break
-            
-            if not switch_dpid or switch_dpid not in self.datapaths:
-                continue
-            
-            sw_datapath = self.datapaths[switch_dpid]
-            sw_parser = sw_datapath.ofproto_parser
-            
-            if i < len(path) - 1:
-                next_switch = path[i + 1]
-                out_intf = self.get_interface_by_neighbor(switch_dpid, next_switch)
-                
-                next_dpid = None
-                for did, cfg in self.switch_info.items():
-                    if cfg['name'] == next_switch:
-                        next_dpid = did
-                        break
-                
-                if next_dpid:
-                    in_intf_next = self.get_interface_by_neighbor(next_dpid, switch_name)
-                    if in_intf_next:
-                        next_hop_mac = self.ip_to_mac(in_intf_next['ip'])
-                    else:
-                        next_hop_mac = None
-                else:
-                    next_hop_mac = None
+
+    def _egress_info(self, switch_dpid, switch_name, neighbor_name):
+        """Memoized (out_port, src_mac, next_hop_mac) for one egress hop"""
+        # Depends only on config and port-desc state, so it is resolved
+        # once per (switch, neighbor) and shared by every flow install
+        key = (switch_dpid, neighbor_name)
+        info = self._egress_template.get(key, False)
+        if info is not False:
+            return info
+        
+        info = None
+        out_intf = self.get_interface_by_neighbor(switch_dpid, neighbor_name)
+        if out_intf:
+            next_dpid = self.name_to_dpid.get(neighbor_name)
+            if next_dpid:
+                # Neighbor is a switch: next hop MAC is its facing interface
+                in_intf_next = self.get_interface_by_neighbor(next_dpid, switch_name)
+                next_hop_mac = self.ip_to_mac(in_intf_next['ip']) if in_intf_next else None
             else:
-                host_neighbor = None
-                for host_ip, host_cfg in self.host_info.items():
-                    if host_ip == dst_ip:
-                        if host_cfg['switch'] == switch_name:
-                            host_neighbor = host_cfg['name']
-                            break
-                
-                if not host_neighbor:
-                    self.logger.error("Final switch %s not connected to %s", 
-                                    switch_name, dst_ip)
-                    continue
-                
-                out_intf = self.get_interface_by_neighbor(switch_dpid, host_neighbor)
-                next_hop_mac = self.ip_to_mac(dst_ip)
-            
-            if not out_intf:
-                self.logger.error("Cannot find output interface on %s", switch_name)
-                continue
-            
-            if not next_hop_mac:
-                self.logger.error("Cannot determine next hop MAC for %s", switch_name)
-                continue
+                # Neighbor is a host
+                next_hop_mac = None
+                for host_cfg in self.host_info.values():
+                    if host_cfg['name'] == neighbor_name:
+                        next_hop_mac = host_cfg['mac']
+                        break
             
             out_port = self.get_port_by_interface_name(switch_dpid, out_intf['name'])
-            if not out_port:
-                self.logger.error("Cannot find port number for %s", out_intf['name'])
-                continue
-            
             src_mac = self.ip_to_mac(out_intf['ip'])
-            if not src_mac:
+            if not src_mac and out_port:
                 src_mac = self.get_mac_by_port(switch_dpid, out_port)
             
-            if not src_mac:
-                self.logger.error("Cannot determine source MAC for interface %s", out_intf['name'])
+            if next_hop_mac and out_port and src_mac:
+                info = (out_port, src_mac, next_hop_mac)
+        
+        # Failed resolutions are cached too; the cache is cleared whenever
+        # port-desc or topology state changes
+        self._egress_template[key] = info
+        return info
+
+
+    def _install_bidirectional(self, path, src_ip, dst_ip):
+        """Install both flow directions in a single walk of the path"""
+        # One pass resolves each switch's dpid and egress hops for the
+        # forward (towards dst_ip) and reverse (towards src_ip)
+        # directions together, instead of walking the path twice and
+        # repeating every switch lookup
+        name_to_dpid = self.name_to_dpid
+        datapaths = self.datapaths
+        egress_info = self._egress_info
+        action_cache = self._action_cache
+        last = len(path) - 1
+        
+        for i, switch_name in enumerate(path):
+            switch_dpid = name_to_dpid.get(switch_name)
+            
+            if not switch_dpid or switch_dpid not in datapaths:
                 continue
             
-            match = sw_parser.OFPMatch(
-                eth_type=ether_types.ETH_TYPE_IP,
-                ipv4_dst=dst_ip)
+            sw_datapath = datapaths[switch_dpid]
+            sw_parser = sw_datapath.ofproto_parser
             
-            actions = [
-                sw_parser.OFPActionDecNwTtl(),
-                sw_parser.OFPActionSetField(eth_src=src_mac),
-                sw_parser.OFPActionSetField(eth_dst=next_hop_mac),
-                sw_parser.OFPActionOutput(out_port)
-            ]
+            if i < last:
+                fwd_neighbor = path[i + 1]
+            elif self.ip_to_switch.get(dst_ip) == switch_name:
+                fwd_neighbor = self.ip_to_host_name[dst_ip]
+            else:
+                self.logger.error("Final switch %s not connected to %s", 
+                                switch_name, dst_ip)
+                fwd_neighbor = None
             
-            self.add_flow(sw_datapath, 10, match, actions, idle_timeout=300)
+            if i > 0:
+                rev_neighbor = path[i - 1]
+            elif self.ip_to_switch.get(src_ip) == switch_name:
+                rev_neighbor = self.ip_to_host_name[src_ip]
+            else:
+                self.logger.error("First switch %s not connected to %s", 
+                                switch_name, src_ip)
+                rev_neighbor = None
             
-            self.logger.info("Flow on %s: dst=%s -> port=%d (eth_src=%s, eth_dst=%s)",
-                           switch_name, dst_ip, out_port, src_mac, next_hop_mac)
\ No newline at end of file
+            for flow_dst, neighbor in ((dst_ip, fwd_neighbor),
+                                       (src_ip, rev_neighbor)):
+                if not neighbor:
+                    continue
+                
+                info = egress_info(switch_dpid, switch_name, neighbor)
+                if not info:
+                    self.logger.error("Cannot resolve egress from %s towards %s", 
+                                    switch_name, neighbor)
+                    continue
+                
+                out_port, src_mac, next_hop_mac = info
+                
+                match = _mk_match_ipdst(sw_parser, flow_dst)
+                
+                # The action list depends only on the egress hop, so all
+                # flows sharing a next hop reuse one list; only the match
+                # varies per destination IP
+                actions = action_cache.get((switch_dpid, neighbor))
+                if actions is None:
+                    actions = [
+                        sw_parser.OFPActionDecNwTtl(),
+                        sw_parser.OFPActionSetField(eth_src=src_mac),
+                        sw_parser.OFPActionSetField(eth_dst=next_hop_mac),
+                        sw_parser.OFPActionOutput(out_port)
+                    ]
+                    action_cache[(switch_dpid, neighbor)] = actions
+                
+                # Permanent entries: reconvergence (flow clears on link events)
+                # is the sole invalidation, so active flows are never torn
+                # down and reinstalled just because a timer fired
+                self.add_flow(sw_datapath, 10, match, actions, idle_timeout=0, batch=True)
+                
+                self.logger.info("Flow on %s: dst=%s -> port=%d (eth_src=%s, eth_dst=%s)",
+                               switch_name, flow_dst, out_port, src_mac, next_hop_mac)
+
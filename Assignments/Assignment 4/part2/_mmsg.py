@@ -0,0 +1,156 @@
+"""ctypes bindings for Linux sendmmsg/recvmmsg.
+
+The part 1 sender pushes 60-packet bursts and the receiver drains them
+one recvfrom at a time, so both sides pay one syscall per 1200-byte
+datagram. sendmmsg/recvmmsg collapse a whole burst into a single
+syscall. The mmsghdr/iovec arrays are allocated once per socket and
+reused for every batch. Importing this module fails cleanly when the
+libc symbols are unavailable (non-Linux), so callers treat it as an
+optional accelerator and keep the sendto/recvfrom path as fallback.
+"""
+import ctypes
+import errno
+import os
+import socket
+
+MSG_DONTWAIT = 0x40
+
+_libc = ctypes.CDLL("libc.so.6", use_errno=True)
+
+
+class _iovec(ctypes.Structure):
+    _fields_ = [('iov_base', ctypes.c_void_p),
+                ('iov_len', ctypes.c_size_t)]
+
+
+class _msghdr(ctypes.Structure):
+    _fields_ = [('msg_name', ctypes.c_void_p),
+                ('msg_namelen', ctypes.c_uint),
+                ('msg_iov', ctypes.POINTER(_iovec)),
+                ('msg_iovlen', ctypes.c_size_t),
+                ('msg_control', ctypes.c_void_p),
+                ('msg_controllen', ctypes.c_size_t),
+                ('msg_flags', ctypes.c_int)]
+
+
+class _mmsghdr(ctypes.Structure):
+    _fields_ = [('msg_hdr', _msghdr),
+                ('msg_len', ctypes.c_uint)]
+
+
+class _sockaddr_in(ctypes.Structure):
+    _fields_ = [('sin_family', ctypes.c_ushort),
+                ('sin_port', ctypes.c_ushort),
+                ('sin_addr', ctypes.c_ubyte * 4),
+                ('sin_zero', ctypes.c_ubyte * 8)]
+
+
+_libc.sendmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(_mmsghdr),
+                           ctypes.c_uint, ctypes.c_int]
+_libc.recvmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(_mmsghdr),
+                           ctypes.c_uint, ctypes.c_int, ctypes.c_void_p]
+
+# Each message may be scatter-gathered from up to two buffers
+# (e.g. header + payload view)
+_IOV_PER_MSG = 2
+
+
+def _as_base(buf):
+    """Return (iov_base pointer, keep-alive ref) for a bytes-like buffer"""
+    if isinstance(buf, bytes):
+        ref = ctypes.c_char_p(buf)
+        return ctypes.cast(ref, ctypes.c_void_p), ref
+    ref = (ctypes.c_char * len(buf)).from_buffer(buf)
+    return ctypes.cast(ctypes.byref(ref), ctypes.c_void_p), ref
+
+
+class MmsgSender:
+    """Sends batches of datagrams to one address via sendmmsg"""
+
+    def __init__(self, sock, batch=64):
+        self._sock = sock
+        self._batch = batch
+        self._iovs = (_iovec * (batch * _IOV_PER_MSG))()
+        self._hdrs = (_mmsghdr * batch)()
+        self._addr = _sockaddr_in()
+        iov_size = ctypes.sizeof(_iovec)
+        for i in range(batch):
+            hdr = self._hdrs[i].msg_hdr
+            hdr.msg_name = ctypes.cast(ctypes.byref(self._addr),
+                                       ctypes.c_void_p)
+            hdr.msg_namelen = ctypes.sizeof(_sockaddr_in)
+            hdr.msg_iov = ctypes.cast(
+                ctypes.byref(self._iovs, i * _IOV_PER_MSG * iov_size),
+                ctypes.POINTER(_iovec))
+
+    def send(self, msgs, addr):
+        """Send up to one batch of messages in a single syscall.
+
+        Each message is a bytes-like buffer or a sequence of up to
+        _IOV_PER_MSG buffers. Returns the number of messages accepted
+        by the kernel (0 when the send buffer is full).
+        """
+        count = min(len(msgs), self._batch)
+        self._addr.sin_family = socket.AF_INET
+        self._addr.sin_port = socket.htons(addr[1])
+        self._addr.sin_addr[:] = socket.inet_aton(addr[0])
+
+        refs = []  # keep buffer exports alive across the syscall
+        for i in range(count):
+            msg = msgs[i]
+            if isinstance(msg, (bytes, bytearray, memoryview)):
+                msg = (msg,)
+            base_iov = i * _IOV_PER_MSG
+            for j, buf in enumerate(msg):
+                ptr, ref = _as_base(buf)
+                self._iovs[base_iov + j].iov_base = ptr
+                self._iovs[base_iov + j].iov_len = len(buf)
+                refs.append(ref)
+            self._hdrs[i].msg_hdr.msg_iovlen = len(msg)
+
+        sent = _libc.sendmmsg(self._sock.fileno(), self._hdrs, count, 0)
+        if sent < 0:
+            err = ctypes.get_errno()
+            if err in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return 0
+            raise OSError(err, os.strerror(err))
+        return sent
+
+
+class MmsgReceiver:
+    """Drains pending datagrams from a socket via recvmmsg"""
+
+    def __init__(self, sock, batch=64, bufsize=2048):
+        self._sock = sock
+        self._batch = batch
+        self._bufs = [bytearray(bufsize) for _ in range(batch)]
+        self._iovs = (_iovec * batch)()
+        self._hdrs = (_mmsghdr * batch)()
+        self._refs = []
+        iov_size = ctypes.sizeof(_iovec)
+        for i in range(batch):
+            ref = (ctypes.c_char * bufsize).from_buffer(self._bufs[i])
+            self._refs.append(ref)
+            self._iovs[i].iov_base = ctypes.cast(ctypes.byref(ref),
+                                                 ctypes.c_void_p)
+            self._iovs[i].iov_len = bufsize
+            hdr = self._hdrs[i].msg_hdr
+            hdr.msg_iov = ctypes.cast(ctypes.byref(self._iovs, i * iov_size),
+                                      ctypes.POINTER(_iovec))
+            hdr.msg_iovlen = 1
+
+    def recv(self):
+        """Receive whatever is queued, without blocking, in one syscall.
+
+        Returns a list of packets (copies, since the underlying buffers
+        are reused on the next call); empty when nothing is pending.
+        """
+        got = _libc.recvmmsg(self._sock.fileno(), self._hdrs, self._batch,
+                             MSG_DONTWAIT, None)
+        if got < 0:
+            err = ctypes.get_errno()
+            if err in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return []
+            raise OSError(err, os.strerror(err))
+        return [bytes(memoryview(self._bufs[i])[:self._hdrs[i].msg_len])
+                for i in range(got)]
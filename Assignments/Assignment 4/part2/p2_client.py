@@ -1,5 +1,6 @@
 import socket
 import argparse
+import os
 import struct
 
 # Constants
@@ -8,6 +9,9 @@ HEADER_SIZE = 20
 MAX_DATA = MAX_PAYLOAD - HEADER_SIZE
 EOF_MARKER = b"EOF"
 
+# Per-packet prints dominate receive time; enable only when debugging
+DEBUG = os.environ.get("P2_DEBUG") == "1"
+
 def parse_packet(packet):
     """
     Parse packet to extract sequence number and data
@@ -23,9 +27,14 @@ def parse_packet(packet):
     data = packet[HEADER_SIZE:]
     return seq_num, data
 
-def create_ack(seq_num):
-    """Create ACK packet with next expected sequence number"""
-    return struct.pack('!I', seq_num) + b'\x00' * 16
+def create_ack(seq_num, ts_echo=b'\x00' * 8):
+    """Create ACK packet with next expected sequence number.
+
+    ts_echo carries back the send timestamp from header bytes 4-12 of
+    the packet being acknowledged, so the server can take unambiguous
+    RTT samples.
+    """
+    return struct.pack('!I', seq_num) + ts_echo + b'\x00' * 8
 
 def receive_file(server_ip, server_port, pref_filename):
     """
@@ -60,19 +69,21 @@ def receive_file(server_ip, server_port, pref_filename):
         while True:
             try:
                 seq_num, data = parse_packet(packet)
-                
+                ts_echo = packet[4:12]  # echoed back in every ACK
+
                 if seq_num == expected_seq_num:
                     # In-order packet
                     if data == EOF_MARKER:
                         print("Received EOF")
                         # Send final ACK
-                        ack = create_ack(expected_seq_num + 1)
+                        ack = create_ack(expected_seq_num + 1, ts_echo)
                         client_socket.sendto(ack, server_address)
                         break
                     
                     # Write data to file
                     file.write(data)
-                    print(f"Received packet {seq_num}")
+                    if DEBUG:
+                        print(f"Received packet {seq_num}")
                     expected_seq_num += 1
                     
                     # Check if we have buffered packets
@@ -80,32 +91,35 @@ def receive_file(server_ip, server_port, pref_filename):
                         buffered_data = out_of_order_packets[expected_seq_num]
                         if buffered_data == EOF_MARKER:
                             print("Received EOF from buffer")
-                            ack = create_ack(expected_seq_num + 1)
+                            ack = create_ack(expected_seq_num + 1, ts_echo)
                             client_socket.sendto(ack, server_address)
                             expected_seq_num += 1
                             break
                         file.write(buffered_data)
-                        print(f"Wrote buffered packet {expected_seq_num}")
+                        if DEBUG:
+                            print(f"Wrote buffered packet {expected_seq_num}")
                         del out_of_order_packets[expected_seq_num]
                         expected_seq_num += 1
                     
                     # Send cumulative ACK
-                    ack = create_ack(expected_seq_num)
+                    ack = create_ack(expected_seq_num, ts_echo)
                     client_socket.sendto(ack, server_address)
                     
                 elif seq_num > expected_seq_num:
                     # Out-of-order packet - buffer it
-                    print(f"Buffering out-of-order packet {seq_num}")
+                    if DEBUG:
+                        print(f"Buffering out-of-order packet {seq_num}")
                     out_of_order_packets[seq_num] = data
                     
                     # Send duplicate ACK for expected packet
-                    ack = create_ack(expected_seq_num)
+                    ack = create_ack(expected_seq_num, ts_echo)
                     client_socket.sendto(ack, server_address)
                 
                 else:
                     # Old/duplicate packet - send ACK again
-                    print(f"Received duplicate packet {seq_num}")
-                    ack = create_ack(expected_seq_num)
+                    if DEBUG:
+                        print(f"Received duplicate packet {seq_num}")
+                    ack = create_ack(expected_seq_num, ts_echo)
                     client_socket.sendto(ack, server_address)
                 
                 # Receive next packet